@@ -1,65 +1,191 @@
 import os
 import secrets
-from flask import Flask, request, jsonify, render_template, url_for, redirect, flash, session
+from flask import Flask, Blueprint, Response, request, jsonify, render_template, url_for, redirect, flash, session, g, has_request_context, current_app
+from flask.json.provider import DefaultJSONProvider
 from flask_wtf.csrf import CSRFProtect
+from jinja2 import FileSystemBytecodeCache
 from dotenv import load_dotenv
 import sqlite3
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime
-from functools import wraps, lru_cache
-from werkzeug.security import generate_password_hash, check_password_hash
+from datetime import datetime, timezone
+from functools import wraps
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
 from werkzeug.middleware.proxy_fix import ProxyFix
-from werkzeug.utils import secure_filename
+from werkzeug.utils import secure_filename, get_content_type
+from werkzeug.http import http_date, is_resource_modified, parse_range_header
+from werkzeug.exceptions import RequestEntityTooLarge
 import re
 import logging
+import logging.handlers
 import threading
 import queue
 import time
+import atexit
 from contextlib import contextmanager
 import html
+import random
+import json
+import hashlib
+import hmac
+import base64
+import copy
+import io
+import csv
+import gzip
+import glob
+import shutil
+import socket
+import tempfile
+import mimetypes
+import urllib.request
+import urllib.error
+import itertools
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+import xml.etree.ElementTree as ET
 from markupsafe import Markup
+import click
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, the log file is then only safe with a single process
+    fcntl = None
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import padding
+except ImportError:  # only needed to verify bunq's RSA-signed payment callbacks
+    serialization = None
+
+try:
+    import orjson
+except ImportError:  # optional; Flask's stdlib json provider is used without it
+    orjson = None
 
 # Laad omgevingsvariabelen
 load_dotenv()
 
-app = Flask(__name__, static_folder='static', template_folder='templates')
+# All routes, template globals and CLI commands live on this blueprint; create_app() wires it up
+bp = Blueprint('main', __name__, cli_group=None)
 
 # Configure file upload
-app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB max file size
 UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
-# Create upload folder if it doesn't exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-# Initialize CSRF protection
-csrf = CSRFProtect(app)
-
-# Generate a secure secret key if not provided
-secret_key = os.getenv('SECRET_KEY')
-if not secret_key or secret_key == 'your_very_secure_secret_key_here_change_this_in_production':
-    secret_key = secrets.token_hex(32)
-    print("WARNING: Using generated secret key. Set SECRET_KEY in .env for production!")
-
-app.config['SECRET_KEY'] = secret_key
-app.config['PERMANENT_SESSION_LIFETIME'] = int(os.getenv('SESSION_LIFETIME', 1800))
-
-# Performance optimizations
-app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 31536000  # 1 year cache for static files
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# Add ProxyFix for better handling behind reverse proxies
-app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
+# Compiled templates shared by all workers, so a recycled worker does not compile them again; empty disables
+JINJA_CACHE_DIR = os.getenv('JINJA_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.jinja_cache'))
+
+# Initialize CSRF protection (bound to the app in create_app)
+csrf = CSRFProtect()
+
+# JSON encoding for jsonify() and request.get_json(): 'auto' uses orjson when it is installed
+JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'auto').lower()
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; dates, decimals and dataclasses keep Flask's encoding"""
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS if orjson else 0
+
+    def _dumpb(self, obj, indent=False):
+        option = self.options
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        return self._dumpb(obj, indent=kwargs.get('indent')).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Encoded straight to bytes, skipping the str round trip of the default provider
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self._dumpb(obj, indent=indent) + b'\n', mimetype=self.mimetype)
+
+def select_json_provider(app):
+    """Install the orjson provider unless JSON_PROVIDER asks for the stdlib one"""
+    if JSON_PROVIDER == 'json':
+        return
+    if orjson is None:
+        if JSON_PROVIDER == 'orjson':
+            logger.warning("JSON_PROVIDER=orjson maar orjson is niet geïnstalleerd, de standaard json-module wordt gebruikt")
+        return
+    app.json = OrjsonProvider(app)
+
+def create_app():
+    """Application factory: cheap to call, does no database or thread work.
+
+    Schema migrations and seeding run once via `flask db upgrade` or the
+    Gunicorn on_starting hook; the database pool and e-mail thread start lazily in
+    each worker on first use.
+    """
+    app = Flask(__name__, static_folder='static', template_folder='templates')
+
+    # Create upload folder if it doesn't exist
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+    # Generate a secure secret key if not provided
+    secret_key = os.getenv('SECRET_KEY')
+    if not secret_key or secret_key == 'your_very_secure_secret_key_here_change_this_in_production':
+        secret_key = secrets.token_hex(32)
+        print("WARNING: Using generated secret key. Set SECRET_KEY in .env for production!")
+
+    app.config['SECRET_KEY'] = secret_key
+    app.config['PERMANENT_SESSION_LIFETIME'] = int(os.getenv('SESSION_LIFETIME', 1800))
+
+    # Performance optimizations
+    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 31536000  # 1 year cache for static files
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    select_json_provider(app)
+
+    # Templates are never re-checked for changes outside development
+    app.config['TEMPLATES_AUTO_RELOAD'] = os.getenv('FLASK_ENV') == 'development'
+    if JINJA_CACHE_DIR:
+        try:
+            os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+            if not os.access(JINJA_CACHE_DIR, os.W_OK):
+                raise PermissionError(f"{JINJA_CACHE_DIR} is niet schrijfbaar")
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+        except OSError as e:
+            logger.warning(f"Template bytecode-cache uitgeschakeld: {e}")
+
+    csrf.init_app(app)
+    app.register_blueprint(bp)
+
+    if STATIC_MEMORY_CACHE:
+        app.wsgi_app = StaticAssetMiddleware(app.wsgi_app, app.static_folder, app.static_url_path,
+                                             STATIC_MEMORY_ASSETS, app.config['SEND_FILE_MAX_AGE_DEFAULT'])
+
+    # Add ProxyFix for better handling behind reverse proxies
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
+    return app
+
+@bp.cli.command('compile-templates')
+def compile_templates_command():
+    """Compile every template into the Jinja bytecode cache (run once at image build time)."""
+    env = current_app.jinja_env
+    if env.bytecode_cache is None:
+        click.echo('Geen bytecode-cache beschikbaar; controleer JINJA_CACHE_DIR.')
+        raise SystemExit(1)
+    names = env.list_templates()
+    for name in names:
+        env.get_template(name)
+    click.echo(f"{len(names)} templates gecompileerd naar {JINJA_CACHE_DIR}.")
 
 # Make configuration functions available in templates
-@app.template_global()
+@bp.app_template_global()
 def get_config_value(key, default=None):
     """Get configuration value for use in templates"""
     return get_config(key, default)
 
-@app.template_global()
+@bp.app_template_global()
 def render_main_content():
     """Render the main content with dynamic placeholders"""
     content = get_config('main_content', '')
@@ -82,6 +208,104 @@ def render_main_content():
     # Return as safe HTML (Markup)
     return Markup(content)
 
+# Static URLs carry a content hash (?v=...), so the year-long browser cache and the service
+# worker's precache pick up a changed file on the next page load
+_static_versions = {}
+
+def static_file_version(filename):
+    """Short content hash of a static file, recomputed only when its mtime changes"""
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _static_versions.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = (mtime, hashlib.sha1(f.read()).hexdigest()[:10])
+        _static_versions[path] = cached
+    return cached[1]
+
+@bp.app_url_defaults
+def add_static_version(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        version = static_file_version(values['filename'])
+        if version:
+            values['v'] = version
+
+# Optional in-memory serving of hot static assets (STATIC_MEMORY_CACHE=1): each worker reads the files once
+# at startup and answers them with precomputed headers, before Flask's routing, session and logging hooks
+STATIC_MEMORY_CACHE = os.getenv('STATIC_MEMORY_CACHE', '0') == '1'
+STATIC_MEMORY_ASSETS = [
+    name.strip() for name in os.getenv('STATIC_MEMORY_ASSETS', 'style.css,script.js,favicon.png,bbq_achtergrond.png').split(',')
+    if name.strip()
+]
+
+class StaticAssetMiddleware:
+    """WSGI middleware serving GET/HEAD for a fixed set of static files from memory.
+
+    Handles If-None-Match / If-Modified-Since (304) and single byte ranges with If-Range
+    (206 / 416); everything else goes to the wrapped app. Workers must be restarted to
+    pick up a changed file.
+    """
+
+    def __init__(self, app, static_folder, static_url_path, names, max_age):
+        self.app = app
+        self.assets = {}
+        for name in names:
+            path = os.path.join(static_folder, name)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                mtime = datetime.fromtimestamp(int(os.path.getmtime(path)), timezone.utc)
+            except OSError as e:
+                logger.warning(f"Statisch bestand {name} niet in het geheugen geladen: {e}")
+                continue
+            etag = f'"{hashlib.sha1(data).hexdigest()[:20]}"'
+            validators = [
+                ('ETag', etag),
+                ('Last-Modified', http_date(mtime)),
+                ('Cache-Control', f'public, max-age={max_age}')
+            ]
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            headers = validators + [
+                ('Content-Type', get_content_type(mimetype, 'utf-8')),
+                ('Accept-Ranges', 'bytes')
+            ]
+            self.assets[f"{static_url_path}/{name}"] = (data, etag, mtime, validators, headers)
+
+    def __call__(self, environ, start_response):
+        asset = self.assets.get(environ.get('PATH_INFO'))
+        if asset is None or environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return self.app(environ, start_response)
+        data, etag, mtime, validators, headers = asset
+        if not is_resource_modified(environ, etag=etag.strip('"'), last_modified=mtime):
+            start_response('304 Not Modified', validators)
+            return []
+
+        status, body = '200 OK', data
+        requested = parse_range_header(environ.get('HTTP_RANGE'))
+        if_range = environ.get('HTTP_IF_RANGE')
+        # Several ranges, a malformed header or a stale If-Range get the whole file
+        if requested and len(requested.ranges) == 1 and (not if_range or if_range in (etag, validators[1][1])):
+            bounds = requested.range_for_length(len(data))
+            if bounds is None:
+                start_response('416 Range Not Satisfiable', headers + [('Content-Range', f'bytes */{len(data)}'), ('Content-Length', '0')])
+                return []
+            start, stop = bounds
+            status, body = '206 Partial Content', data[start:stop]
+            headers = headers + [('Content-Range', f'bytes {start}-{stop - 1}/{len(data)}')]
+        start_response(status, headers + [('Content-Length', str(len(body)))])
+        return [] if environ['REQUEST_METHOD'] == 'HEAD' else [body]
+
+def render_conditional(template, **context):
+    """Render a public page with an ETag; a revalidating browser or service worker gets a bodyless 304"""
+    body = render_template(template, **context)
+    response = Response(body, mimetype='text/html')
+    response.set_etag(hashlib.sha1(body.encode()).hexdigest()[:16])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 # E-mail configuratie - wordt gelezen uit database via get_config()
 def get_smtp_config():
     """Get SMTP configuration from database"""
@@ -108,43 +332,84 @@ BBQ_DETAILS = {
 # Database setup - Fixed path
 DATABASE = os.getenv('DATABASE_PATH', 'bbq.db')
 
+# Pool size should be at least the number of request threads per worker (gthread)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000))
+# WAL size above which the maintenance job checkpoints; also the size the -wal file is trimmed back to
+WAL_CHECKPOINT_MB = float(os.getenv('WAL_CHECKPOINT_MB', 16))
+
 # Database connection pool
 class DatabasePool:
-    def __init__(self, database_path, max_connections=10):
+    def __init__(self, database_path, max_connections=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
         self.database_path = database_path
         self.max_connections = max_connections
+        self.timeout = timeout
         self.connections = queue.Queue(maxsize=max_connections)
         self.lock = threading.Lock()
-        self._initialize_pool()
+        # Connections are opened lazily, so nothing is created before Gunicorn forks
+        self._created = 0
+        self._pid = os.getpid()
     
-    def _initialize_pool(self):
-        """Initialize the connection pool"""
-        for _ in range(self.max_connections):
-            conn = sqlite3.connect(self.database_path, check_same_thread=False)
-            conn.row_factory = sqlite3.Row
-            conn.execute('PRAGMA journal_mode=WAL')  # Enable WAL mode for better concurrency
-            conn.execute('PRAGMA synchronous=NORMAL')  # Balance between safety and speed
-            conn.execute('PRAGMA cache_size=10000')  # Increase cache size
-            conn.execute('PRAGMA temp_store=MEMORY')  # Store temp tables in memory
-            self.connections.put(conn)
+    def create_connection(self):
+        """Open and configure one pooled connection"""
+        # Each connection is used by one thread/greenlet at a time; the pool hands it over
+        conn = sqlite3.connect(self.database_path, check_same_thread=False,
+                               timeout=DB_BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')  # Enable WAL mode for better concurrency
+        conn.execute('PRAGMA synchronous=NORMAL')  # Balance between safety and speed
+        conn.execute('PRAGMA cache_size=10000')  # Increase cache size
+        conn.execute('PRAGMA temp_store=MEMORY')  # Store temp tables in memory
+        conn.execute(f'PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}')  # Wait for concurrent writers
+        # Shrink the -wal file back to this size whenever a checkpoint lets it restart
+        conn.execute(f'PRAGMA journal_size_limit={int(WAL_CHECKPOINT_MB * 1024 * 1024)}')
+        return conn
+
+    def _checkout(self):
+        """Take an idle connection, open a new one while below the limit, or wait"""
+        with self.lock:
+            if self._pid != os.getpid():
+                # Forked child: SQLite connections must not cross fork(), start afresh
+                self.connections = queue.Queue(maxsize=self.max_connections)
+                self._created = 0
+                self._pid = os.getpid()
+            try:
+                return self.connections.get_nowait()
+            except queue.Empty:
+                if self._created < self.max_connections:
+                    conn = self.create_connection()
+                    self._created += 1
+                    return conn
+        return self.connections.get(timeout=self.timeout)
     
     @contextmanager
     def get_connection(self):
         """Get a connection from the pool"""
-        conn = None
         try:
-            conn = self.connections.get(timeout=5)
+            conn = self._checkout()
+        except queue.Empty:
+            # Surface as a database error so callers' sqlite3.Error handling applies
+            raise sqlite3.OperationalError(
+                f"No database connection available within {self.timeout}s (pool size {self.max_connections})"
+            )
+        try:
             yield conn
         finally:
-            if conn:
-                self.connections.put(conn)
+            # Never hand out a connection with an open transaction (and its write lock)
+            if conn.in_transaction:
+                conn.rollback()
+            self.connections.put(conn)
     
     def close_all(self):
         """Close all connections in the pool"""
+        if self._pid != os.getpid():
+            return
         while not self.connections.empty():
             try:
                 conn = self.connections.get_nowait()
                 conn.close()
+                self._created -= 1
             except queue.Empty:
                 break
 
@@ -155,22 +420,29 @@ db_pool = DatabasePool(DATABASE)
 class EmailQueue:
     def __init__(self):
         self.email_queue = queue.Queue()
-        self.worker_thread = threading.Thread(target=self._email_worker, daemon=True)
-        self.worker_thread.start()
+        self.worker_thread = None
+        self.lock = threading.Lock()
+
+    def _ensure_worker(self):
+        """Start the sender thread on first use, in the process that actually sends"""
+        with self.lock:
+            if self.worker_thread is None or not self.worker_thread.is_alive():
+                self.worker_thread = threading.Thread(target=self._email_worker, daemon=True)
+                self.worker_thread.start()
     
     def _email_worker(self):
         """Background worker for sending emails"""
         while True:
+            # Blocking get: no periodic wake-ups, and a plain greenlet switch under gevent
+            email_data = self.email_queue.get()
             try:
-                email_data = self.email_queue.get(timeout=1)
                 if email_data is None:  # Shutdown signal
                     break
                 self._send_email_sync(email_data)
-                self.email_queue.task_done()
-            except queue.Empty:
-                continue
             except Exception as e:
                 logger.error(f"Error in email worker: {e}")
+            finally:
+                self.email_queue.task_done()
     
     def _send_email_sync(self, email_data):
         """Synchronous email sending (moved from original function)"""
@@ -219,24 +491,164 @@ class EmailQueue:
     
     def send_email_async(self, to_email, subject, body_html, is_html=True):
         """Add email to queue for asynchronous sending"""
+        self._ensure_worker()
         self.email_queue.put((to_email, subject, body_html, is_html))
         logger.info(f"E-mail toegevoegd aan wachtrij voor {to_email}")
 
+    def send_emails_async(self, messages, is_html=True):
+        """Add a batch of (to_email, subject, body_html) messages to the queue"""
+        if not messages:
+            return
+        self._ensure_worker()
+        for to_email, subject, body_html in messages:
+            self.email_queue.put((to_email, subject, body_html, is_html))
+        logger.info(f"{len(messages)} e-mail(s) toegevoegd aan wachtrij")
+
 # Initialize email queue
 email_queue = EmailQueue()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bbq_app.log'),
-        logging.StreamHandler()
-    ]
-)
+# Logging: request threads only put records on a queue; a listener thread per process formats
+# them as JSON lines and writes them to stderr and a size-rotated file shared by all workers
+LOG_FILE = os.getenv('LOG_FILE', 'bbq_app.log')  # empty: log to stderr only
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json or text
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')  # per module, e.g. "app.access=WARNING,werkzeug=ERROR"
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._\-]{1,64}$')
+# Attributes every LogRecord has; anything else was passed with extra=... and goes into the JSON line
+LOG_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process
+        }
+        for key, value in vars(record).items():
+            if key not in LOG_RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class RequestQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        """Merge the message and add the request ID in the logging thread; formatting happens in the listener"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if has_request_context() and 'request_id' in g:
+            record.request_id = g.request_id
+        return record
+
+class SharedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Size-rotated log file that several processes can append to.
+
+    Every write holds an flock on <file>.lock, so lines from different workers
+    never interleave. The worker that crosses maxBytes rotates the file; the
+    others notice the new inode and reopen it.
+    """
+
+    def __init__(self, filename, maxBytes, backupCount):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding='utf-8', delay=True)
+        self.lock_file = None
+
+    def _reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        try:
+            rotated = os.fstat(self.stream.fileno()).st_ino != os.stat(self.baseFilename).st_ino
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            self.stream.close()
+            self.stream = None  # emit() opens the current file
+
+    def emit(self, record):
+        if fcntl is None:
+            super().emit(record)
+            return
+        try:
+            if self.lock_file is None:
+                self.lock_file = open(self.baseFilename + '.lock', 'a')
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            try:
+                self._reopen_if_rotated()
+                super().emit(record)
+            finally:
+                fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+        except Exception:
+            self.handleError(record)
+
+def configure_logging():
+    """Send all records through one queue to a listener thread; returns the started listener"""
+    if LOG_FORMAT == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handlers = [logging.StreamHandler()]
+    if LOG_FILE:
+        handlers.append(SharedRotatingFileHandler(LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [RequestQueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL.upper())
+    invalid = []
+    for item in filter(None, (part.strip() for part in LOG_LEVELS.split(','))):
+        name, _, level = item.partition('=')
+        try:
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+        except ValueError:
+            invalid.append(item)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    if invalid:
+        logging.getLogger(__name__).warning(f"Ongeldige LOG_LEVELS genegeerd: {', '.join(invalid)}")
+    return listener
+
+log_listener = configure_logging()
+# Registered before cleanup(), so it runs after it and still writes its log lines
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger(f'{__name__}.access')
+
+@bp.before_app_request
+def start_request_log():
+    """Give the request an ID (kept from X-Request-ID when a proxy set one) and start its timer"""
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else secrets.token_hex(8)
+    g.request_started = time.perf_counter()
+
+@bp.after_app_request
+def log_request(response):
+    """One access log line per request, with its duration"""
+    if 'request_id' not in g:
+        # An earlier before_request hook (CSRF) rejected the request before start_request_log ran
+        start_request_log()
+    duration_ms = round((time.perf_counter() - g.request_started) * 1000, 2)
+    response.headers['X-Request-ID'] = g.request_id
+    access_logger.info(
+        f"{request.method} {request.path} {response.status_code} {duration_ms}ms",
+        extra={'method': request.method, 'path': request.path, 'status': response.status_code,
+               'duration_ms': duration_ms, 'remote_addr': request.remote_addr}
+    )
+    return response
 
 # Input validation functions
+# A registration is a handful of short fields; larger /api/register bodies are refused before parsing
+REGISTER_MAX_CONTENT_LENGTH = int(os.getenv('REGISTER_MAX_CONTENT_LENGTH', 16 * 1024))
+
 def validate_registration_data(data):
     """Validate registration form data"""
     errors = []
@@ -296,17 +708,50 @@ def validate_registration_data(data):
     
     return errors
 
+# Config snapshot cache; other workers pick up changes after at most CONFIG_CACHE_TTL seconds
+CONFIG_CACHE_TTL = float(os.getenv('CONFIG_CACHE_TTL', 5))
+
+class ConfigCache:
+    """Thread- and greenlet-safe snapshot of the config table, shared by one worker process"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._values = None
+        self._loaded_at = 0.0
+
+    def _is_fresh(self):
+        return self._values is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def get_all(self):
+        """Return the cached {key: value} snapshot, reloading it with one query when stale"""
+        if self._is_fresh():
+            return self._values
+        with self.lock:
+            # Only one thread reloads; the others reuse its result
+            if not self._is_fresh():
+                with db_pool.get_connection() as conn:
+                    rows = conn.execute('SELECT key, value FROM config').fetchall()
+                self._values = {row['key']: row['value'] for row in rows}
+                self._loaded_at = time.monotonic()
+            return self._values
+
+    def invalidate(self):
+        """Drop the snapshot after a local write"""
+        with self.lock:
+            self._values = None
+
+config_cache = ConfigCache(CONFIG_CACHE_TTL)
+
 # Configuration management functions
 def get_config(key, default=None):
-    """Get a configuration value from the database"""
-    with db_pool.get_connection() as conn:
-        try:
-            cursor = conn.execute('SELECT value FROM config WHERE key = ?', (key,))
-            result = cursor.fetchone()
-            return result[0] if result else default
-        except sqlite3.Error as e:
-            logger.error(f"Error getting config {key}: {e}")
-            return default
+    """Get a configuration value (served from the per-process config snapshot)"""
+    try:
+        values = config_cache.get_all()
+    except sqlite3.Error as e:
+        logger.error(f"Error getting config {key}: {e}")
+        return default
+    return values[key] if key in values else default
 
 def set_config(key, value, description=None, category='general'):
     """Set a configuration value in the database"""
@@ -324,7 +769,8 @@ def set_config(key, value, description=None, category='general'):
                 VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
             ''', (key, value, description, category))
             conn.commit()
-            logger.info(f"Configuration updated: {key} = {value}")
+            config_cache.invalidate()
+            logger.info(f"Configuration updated: {key}")
         except sqlite3.Error as e:
             logger.error(f"Error setting config {key}: {e}")
 
@@ -337,10 +783,35 @@ def update_config_value(key, value):
                 WHERE key = ?
             ''', (value, key))
             conn.commit()
-            logger.info(f"Configuration value updated: {key} = {value}")
+            config_cache.invalidate()
+            logger.info(f"Configuration value updated: {key}")
         except sqlite3.Error as e:
             logger.error(f"Error updating config value {key}: {e}")
 
+def update_config_values(values):
+    """Update several configuration values in one transaction, preserving category and description"""
+    if not values:
+        return
+    with db_pool.get_connection() as conn:
+        try:
+            conn.executemany('''
+                UPDATE config SET value = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE key = ?
+            ''', [(value, key) for key, value in values.items()])
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"Error updating config values {', '.join(values)}: {e}")
+            raise
+    # One cache bump for the whole batch
+    config_cache.invalidate()
+    logger.info(f"Configuration values updated: {', '.join(values)}")
+
+def get_config_categories():
+    """Map every configuration key to its category"""
+    with db_pool.get_connection() as conn:
+        return {row['key']: row['category'] for row in conn.execute('SELECT key, category FROM config')}
+
 def get_all_config():
     """Get all configuration settings grouped by category"""
     with db_pool.get_connection() as conn:
@@ -357,30 +828,17 @@ def get_all_config():
             logger.error(f"Error getting all config: {e}")
             return {}
 
-def cleanup_old_config():
-    """Remove old configuration fields that are no longer used"""
-    old_fields = ['welcome_text', 'description_text', 'background_image']
-    
-    with db_pool.get_connection() as conn:
-        cursor = conn.cursor()
-        for field in old_fields:
-            cursor.execute("DELETE FROM config WHERE key = ?", (field,))
-            if cursor.rowcount > 0:
-                logger.info(f"Removed old configuration field: {field}")
-        conn.commit()
-
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def initialize_default_config():
-    """Initialize default configuration values"""
-    # Clean up old fields first
-    cleanup_old_config()
+def initialize_default_config(conn):
+    """Seed default configuration values in bulk (caller commits)"""
     
     defaults = {
         'app_title': ('BBQ-App', 'Titel van de applicatie', 'general'),
+        'duplicate_check': ('1', 'Waarschuwen bij dubbele aanmelding (0=uit, 1=aan)', 'general'),
         'bbq_date': ('zaterdag 15 juni', 'Datum van de BBQ', 'bbq'),
         'bbq_location': ('het buurthuis', 'Locatie van de BBQ', 'bbq'),
         'bbq_deadline': ('10 juni', 'Deadline voor aanmelding', 'bbq'),
@@ -391,6 +849,9 @@ def initialize_default_config():
         'smtp_username': ('', 'SMTP gebruikersnaam', 'email'),
         'smtp_password': ('', 'SMTP wachtwoord', 'email'),
         'organizer_email': ('', 'E-mailadres van de organisator', 'email'),
+        'organizer_notification_mode': ('immediate', 'Notificaties organisator (immediate=per aanmelding, digest=samenvatting)', 'email'),
+        'organizer_digest_minutes': ('15', 'Samenvatting uiterlijk na ... minuten', 'email'),
+        'organizer_digest_size': ('25', 'Samenvatting direct na ... nieuwe aanmeldingen', 'email'),
         'hero_image': ('bbq_achtergrond.png', 'Hero afbeelding', 'content'),
         'primary_color': ('#FF8C00', 'Primaire kleur van de applicatie', 'appearance'),
         'secondary_color': ('#FF6B35', 'Secundaire kleur van de applicatie', 'appearance'),
@@ -410,6 +871,7 @@ def initialize_default_config():
         'benefit_4_icon': ('💰', 'Icoon van voordeel 4', 'benefits'),
         'price_per_adult': ('25', 'Prijs per volwassene in euro', 'variables'),
         'price_per_child': ('12', 'Prijs per kind in euro', 'variables'),
+        'max_persons': ('0', 'Maximum aantal personen (0 = onbeperkt)', 'variables'),
         'payment_method': ('none', 'Betaalmethode (none, bunq)', 'payment'),
         'bunq_me_link': ('', 'Bunq.me betaallink', 'payment'),
         'no_payment_message': ('Uw aanmelding is succesvol ontvangen! Wij nemen binnenkort contact met u op voor de betaling.', 'Bericht bij geen betalingsintegratie', 'payment'),
@@ -417,21 +879,44 @@ def initialize_default_config():
         'not_planned_text': ('De volgende BBQ is nog niet gepland. Houd deze pagina in de gaten voor updates!', 'Alternatieve tekst voor niet gepland modus', 'content')
     }
     
-    for key, (value, description, category) in defaults.items():
-        if get_config(key) is None:
-            set_config(key, value, description, category)
-        else:
-            # Only update category if it's 'general' (default) and should be something else
-            with db_pool.get_connection() as conn:
-                try:
-                    cursor = conn.execute('SELECT category FROM config WHERE key = ?', (key,))
-                    result = cursor.fetchone()
-                    if result and result[0] == 'general' and category != 'general':
-                        conn.execute('UPDATE config SET category = ? WHERE key = ?', (category, key))
-                        conn.commit()
-                        logger.info(f"Updated category for {key} from general to {category}")
-                except sqlite3.Error as e:
-                    logger.error(f"Error updating category for {key}: {e}")
+    # Existing values are kept; only missing keys are inserted
+    cursor = conn.executemany(
+        'INSERT OR IGNORE INTO config (key, value, description, category) VALUES (?, ?, ?, ?)',
+        [(key, value, description, category) for key, (value, description, category) in defaults.items()]
+    )
+    if cursor.rowcount > 0:
+        logger.info(f"{cursor.rowcount} standaard configuratie-instelling(en) toegevoegd")
+
+# Password hashing; tune PASSWORD_HASH_METHOD (e.g. pbkdf2:sha256:300000) to the container's CPU budget.
+# Existing hashes are upgraded transparently on the next successful login.
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+
+def _normalized_hash_method(method):
+    """Expand a Werkzeug hash method to the full prefix it writes, e.g. pbkdf2:sha256:1000000"""
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2':
+        digest = parts[1] if len(parts) > 1 else 'sha256'
+        iterations = parts[2] if len(parts) > 2 else str(DEFAULT_PBKDF2_ITERATIONS)
+        return f"pbkdf2:{digest}:{iterations}"
+    if parts[0] == 'scrypt':
+        n, r, p = (parts[1:] + ['32768', '8', '1'][len(parts) - 1:])[:3]
+        return f"scrypt:{n}:{r}:{p}"
+    return method
+
+def hash_password(password):
+    """Hash a password with the configured method"""
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+def password_needs_rehash(password_hash):
+    """True when a stored hash was made with other parameters than PASSWORD_HASH_METHOD"""
+    return password_hash.split('$', 1)[0] != _normalized_hash_method(PASSWORD_HASH_METHOD)
+
+def get_active_user(conn, username):
+    """Look up an active admin by username, case-insensitively (uses idx_users_username_nocase)"""
+    return conn.execute(
+        'SELECT id, username, password_hash FROM users WHERE username = ? COLLATE NOCASE AND is_active = 1',
+        (username,)
+    ).fetchone()
 
 # Admin user management functions
 def get_all_admins():
@@ -449,11 +934,11 @@ def create_admin(username, password, email=None):
     with db_pool.get_connection() as conn:
         try:
             # Check if username already exists (case-insensitive)
-            cursor = conn.execute('SELECT COUNT(*) FROM users WHERE LOWER(username) = LOWER(?)', (username,))
+            cursor = conn.execute('SELECT COUNT(*) FROM users WHERE username = ? COLLATE NOCASE', (username,))
             if cursor.fetchone()[0] > 0:
                 return False, "Gebruikersnaam bestaat al"
             
-            hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
+            hashed_password = hash_password(password)
             conn.execute('''
                 INSERT INTO users (username, password_hash, email, created_at, is_active)
                 VALUES (?, ?, ?, CURRENT_TIMESTAMP, 1)
@@ -469,7 +954,7 @@ def update_admin_password(admin_id, new_password):
     """Update admin user password"""
     with db_pool.get_connection() as conn:
         try:
-            hashed_password = generate_password_hash(new_password, method='pbkdf2:sha256')
+            hashed_password = hash_password(new_password)
             conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (hashed_password, admin_id))
             conn.commit()
             logger.info(f"Password updated for admin ID: {admin_id}")
@@ -497,9 +982,8 @@ def delete_admin(admin_id):
             return False, f"Fout bij verwijderen admin: {e}"
 
 # Caching for frequently accessed data
-@lru_cache(maxsize=128)
 def get_cached_bbq_details():
-    """Cache BBQ details from configuration"""
+    """BBQ details from the cached config snapshot"""
     return {
         "price_per_adult": float(get_config('price_per_adult', 25.00)),
         "date": get_config('bbq_date', "zaterdag 15 juni"),
@@ -519,82 +1003,1869 @@ def get_db_connection():
         logger.error(f"Database verbindingsfout: {e}")
         return None
 
-def init_db():
-    """Initialize database with optimized tables and indexes"""
+TOTALS_COLUMNS = ('registration_count', 'total_adults', 'total_children', 'total_due_amount', 'total_paid_amount')
+
+def _compute_registration_totals(conn):
+    """Compute registration totals from scratch with a full scan"""
+    row = conn.execute('''
+        SELECT COUNT(*),
+               COALESCE(SUM(persons_adults), 0),
+               COALESCE(SUM(persons_children), 0),
+               COALESCE(SUM(total_amount), 0.0),
+               COALESCE(SUM(paid_amount), 0.0)
+        FROM registrations
+    ''').fetchone()
+    return dict(zip(TOTALS_COLUMNS, tuple(row)))
+
+def _rebuild_registration_totals(conn):
+    """Overwrite the registration_totals summary row (caller commits)"""
+    totals = _compute_registration_totals(conn)
+    conn.execute('''
+        INSERT OR REPLACE INTO registration_totals
+            (id, registration_count, total_adults, total_children, total_due_amount, total_paid_amount)
+        VALUES (1, ?, ?, ?, ?, ?)
+    ''', tuple(totals[column] for column in TOTALS_COLUMNS))
+    return totals
+
+def get_registration_totals(conn):
+    """Read the materialized registration totals (O(1))"""
+    row = conn.execute('SELECT * FROM registration_totals WHERE id = 1').fetchone()
+    if row is None:
+        return dict.fromkeys(TOTALS_COLUMNS, 0)
+    return {column: row[column] for column in TOTALS_COLUMNS}
+
+def check_registration_totals(repair=True):
+    """Compare the summary row with a full recount; optionally rebuild it.
+
+    Returns a tuple (stored, actual) with the totals before the repair.
+    """
     with db_pool.get_connection() as conn:
         try:
-            # Table for registrations with optimized structure
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS registrations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    house_number TEXT,
-                    email TEXT,
-                    persons_adults INTEGER NOT NULL,
-                    persons_children INTEGER DEFAULT 0,
-                    allergies_notes TEXT,
-                    total_amount REAL NOT NULL,
-                    bunq_me_url TEXT,
-                    payment_status TEXT DEFAULT 'pending',
-                    paid_amount REAL DEFAULT 0.0,
-                    registered_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Table for users (admin login)
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    email TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    is_active BOOLEAN DEFAULT 1
-                )
-            ''')
-            
-            # Table for configuration settings
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS config (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    key TEXT UNIQUE NOT NULL,
-                    value TEXT,
-                    description TEXT,
-                    category TEXT DEFAULT 'general',
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create indexes for better query performance
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_registrations_payment_status ON registrations(payment_status)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_registrations_registered_at ON registrations(registered_at)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_registrations_email ON registrations(email)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)')
-            
+            conn.execute('BEGIN IMMEDIATE')
+            stored = get_registration_totals(conn)
+            actual = _compute_registration_totals(conn)
+            if repair:
+                _rebuild_registration_totals(conn)
             conn.commit()
-            logger.info("Database en tabellen gecontroleerd/aangemaakt met optimalisaties.")
-
+            return stored, actual
         except sqlite3.Error as e:
-            logger.error(f"Fout bij aanmaken database tabellen: {e}")
+            conn.rollback()
+            logger.error(f"Fout bij controleren registratietotalen: {e}")
             raise
 
-# BELANGRIJK: Roep init_db() aan bij het opstarten van de applicatie
-with app.app_context():
-    init_db()
-    # Initialize default configuration
-    initialize_default_config()
-    # Voeg een standaard admin gebruiker toe als deze nog niet bestaat
+# Live admin updates (Server-Sent Events)
+CHANGE_LOG_RETENTION = 1000  # events kept for reconnecting clients
+SSE_POLL_INTERVAL = float(os.getenv('SSE_POLL_INTERVAL', 1.0))
+SSE_HEARTBEAT_INTERVAL = 15
+SSE_STREAM_SECONDS = int(os.getenv('SSE_STREAM_SECONDS', 55))
+SSE_POLL_FALLBACK_SECONDS = float(os.getenv('SSE_POLL_FALLBACK_SECONDS', 3))
+
+def _greenlet_worker():
+    """True under gevent's monkey patching, where an idle stream costs a greenlet instead of a request thread"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+# Open streams per worker. Under gthread every stream would pin one of the few request threads,
+# so by default dashboards there poll the change feed instead (one short request per tab every
+# SSE_POLL_FALLBACK_SECONDS)
+SSE_MAX_STREAMS = max(0, int(os.getenv('SSE_MAX_STREAMS', 50 if _greenlet_worker() else 0)))
+sse_stream_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+def record_change(conn, event_type, payload):
+    """Append an event to the change feed in the caller's transaction (caller commits)"""
+    cursor = conn.execute(
+        'INSERT INTO change_log (event_type, payload) VALUES (?, ?)',
+        (event_type, json.dumps(payload, separators=(',', ':')))
+    )
+    conn.execute('DELETE FROM change_log WHERE id <= ?', (cursor.lastrowid - CHANGE_LOG_RETENTION,))
+
+def get_last_change_id(conn):
+    """Return the id of the newest change_log entry (0 when empty)"""
+    return conn.execute('SELECT COALESCE(MAX(id), 0) FROM change_log').fetchone()[0]
+
+def fetch_changes(after_id, limit=200):
+    """Fetch change_log entries after a rowid, plus fresh totals when there are any.
+
+    Returns (events, totals, gap); gap is True when entries were pruned
+    before the client could read them and it has to reload.
+    """
     with db_pool.get_connection() as conn:
+        rows = conn.execute(
+            'SELECT id, event_type, payload FROM change_log WHERE id > ? ORDER BY id LIMIT ?',
+            (after_id, limit)
+        ).fetchall()
+        if not rows:
+            return [], None, False
+        oldest_id = conn.execute('SELECT MIN(id) FROM change_log').fetchone()[0]
+        gap = after_id > 0 and oldest_id > after_id + 1
+        return [tuple(row) for row in rows], get_registration_totals(conn), gap
+
+def _format_sse(data, event=None, event_id=None):
+    """Serialize one Server-Sent Event frame"""
+    frame = ''
+    if event_id is not None:
+        frame += f"id: {event_id}\n"
+    if event:
+        frame += f"event: {event}\n"
+    return frame + f"data: {data}\n\n"
+
+# Full-text search over registrations (FTS5 index kept in sync by triggers, see migrations/0007)
+SEARCH_RESULT_LIMIT = 50
+SEARCH_COLUMN_WEIGHTS = (10.0, 5.0, 2.0, 1.0)  # name, house_number, email, allergies_notes
+
+def build_search_query(text):
+    """Turn free user input into an FTS5 prefix query, or None when nothing is searchable"""
+    # Quote every token so FTS5 operators in the input are matched literally
+    tokens = re.findall(r'\w+', text.lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens[:8])
+
+def search_registrations(conn, text, limit=SEARCH_RESULT_LIMIT):
+    """Return registrations matching all search terms, best match first"""
+    match = build_search_query(text)
+    if match is None:
+        return []
+    weights = ', '.join(str(weight) for weight in SEARCH_COLUMN_WEIGHTS)
+    return conn.execute(
+        f'''SELECT r.id, r.name, r.house_number, r.email, r.persons_adults, r.persons_children,
+                   r.allergies_notes, r.total_amount, r.paid_amount, r.payment_status, r.registered_at
+            FROM registrations_fts
+            JOIN registrations r ON r.id = registrations_fts.rowid
+            WHERE registrations_fts MATCH ?
+            ORDER BY bm25(registrations_fts, {weights}), r.registered_at DESC
+            LIMIT ?''',
+        (match, limit)
+    ).fetchall()
+
+# Reports derived from registrations, cached per worker until the next registration change
+class ChangeVersionCache:
+    """Per-worker cache stamped with the newest change_log id.
+
+    A registration change in any worker adds a change_log row, so the next
+    read sees a new id and rebuilds; until then the cached value is served.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, build, max_age=None):
+        """Return the cached value for key, calling build(conn) when it is outdated.
+
+        max_age (seconds) additionally expires values that depend on the clock.
+        """
+        with db_pool.get_connection() as conn:
+            version = get_last_change_id(conn)
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and (max_age is None or time.monotonic() - entry[1] < max_age):
+                return entry[2]
+            value = build(conn)
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), value)
+        return value
+
+report_cache = ChangeVersionCache()
+
+def build_catering_report(conn):
+    """Headcounts per payment status, diet tag counts and the registrations with notes"""
+    statuses = [dict(row) for row in conn.execute('''
+        SELECT payment_status, COUNT(*) AS registrations, SUM(persons_adults) AS adults,
+               SUM(COALESCE(persons_children, 0)) AS children,
+               SUM(total_amount) AS due_amount, SUM(COALESCE(paid_amount, 0)) AS paid_amount
+        FROM registrations
+        GROUP BY payment_status
+        ORDER BY payment_status
+    ''')]
+    # Tags are maintained by triggers, so this is a GROUP BY over the small side table
+    tags = [dict(row) for row in conn.execute('''
+        SELECT t.tag, COUNT(*) AS registrations,
+               SUM(r.persons_adults + COALESCE(r.persons_children, 0)) AS persons
+        FROM registration_tags t
+        JOIN registrations r ON r.id = t.registration_id
+        WHERE r.payment_status != 'cancelled'
+        GROUP BY t.tag
+        ORDER BY registrations DESC, t.tag
+    ''')]
+    notes = [dict(row) for row in conn.execute('''
+        SELECT r.id, r.name, r.house_number, r.persons_adults, r.persons_children, r.payment_status,
+               r.allergies_notes, group_concat(t.tag, ', ') AS tags
+        FROM registration_tags t
+        JOIN registrations r ON r.id = t.registration_id
+        WHERE r.payment_status != 'cancelled'
+        GROUP BY r.id
+        ORDER BY r.name
+    ''')]
+    active = [status for status in statuses if status['payment_status'] != 'cancelled']
+    return {
+        'generated_at': datetime.now().strftime('%d-%m-%Y %H:%M:%S'),
+        'headcount': {
+            'adults': sum(status['adults'] for status in active),
+            'children': sum(status['children'] for status in active)
+        },
+        'statuses': statuses,
+        'tags': tags,
+        'notes': notes
+    }
+
+def get_catering_report():
+    """Catering report, rebuilt only after registrations changed"""
+    return report_cache.get('catering', build_catering_report)
+
+# Sign-up velocity analytics; the series are computed in SQLite with window functions
+ANALYTICS_CACHE_TTL = int(os.getenv('ANALYTICS_CACHE_TTL', 60))
+ANALYTICS_BUCKETS = {
+    'hour': ('%Y-%m-%dT%H:00:00Z', 7),   # (strftime format, default days back)
+    'day': ('%Y-%m-%d', 365)
+}
+ANALYTICS_VELOCITY_WINDOW = 7  # buckets in the chart's moving average, days of pace behind the projection
+DUTCH_MONTHS = {
+    'januari': 1, 'februari': 2, 'maart': 3, 'april': 4, 'mei': 5, 'juni': 6,
+    'juli': 7, 'augustus': 8, 'september': 9, 'oktober': 10, 'november': 11, 'december': 12
+}
+
+def parse_deadline(text, today=None):
+    """Parse the free-text bbq_deadline ('10 juni', '10 juni 2026', '2026-06-10', '10-06-2026') into a date"""
+    today = today or datetime.now().date()
+    text = (text or '').strip().lower()
+    for fmt in ('%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    match = re.search(r'(\d{1,2})\s+([a-z]+)(?:\s+(\d{4}))?', text)
+    if not match or match.group(2) not in DUTCH_MONTHS:
+        return None
+    try:
+        return datetime(int(match.group(3) or today.year), DUTCH_MONTHS[match.group(2)], int(match.group(1))).date()
+    except ValueError:
+        return None
+
+def build_registration_series(conn, bucket, days):
+    """Registrations, persons and revenue per bucket with running totals, oldest first.
+
+    The range predicate on registered_at uses idx_registrations_registered_at;
+    running totals start from everything registered before the range, and
+    velocity is the moving average over the last ANALYTICS_VELOCITY_WINDOW
+    buckets (empty buckets count as zero).
+    """
+    bucket_format = ANALYTICS_BUCKETS[bucket][0]
+    bucket_days = 1 / 24 if bucket == 'hour' else 1
+    rows = conn.execute('''
+        WITH buckets AS (
+            SELECT strftime(:format, registered_at) AS bucket,
+                   COUNT(*) AS registrations,
+                   SUM(persons_adults + COALESCE(persons_children, 0)) AS persons,
+                   SUM(total_amount) AS revenue
+            FROM registrations
+            WHERE registered_at >= datetime('now', :since) AND payment_status != 'cancelled'
+            GROUP BY bucket
+        ),
+        before_range AS (
+            SELECT COUNT(*) AS registrations,
+                   COALESCE(SUM(persons_adults + COALESCE(persons_children, 0)), 0) AS persons,
+                   COALESCE(SUM(total_amount), 0) AS revenue
+            FROM registrations
+            WHERE registered_at < datetime('now', :since) AND payment_status != 'cancelled'
+        )
+        SELECT b.bucket, b.registrations, b.persons, ROUND(b.revenue, 2) AS revenue,
+               p.registrations + SUM(b.registrations) OVER running AS cumulative_registrations,
+               p.persons + SUM(b.persons) OVER running AS cumulative_persons,
+               ROUND(p.revenue + SUM(b.revenue) OVER running, 2) AS cumulative_revenue,
+               ROUND(SUM(b.registrations) OVER velocity * 1.0 / :window, 2) AS velocity
+        FROM buckets b, before_range p
+        WINDOW running AS (ORDER BY b.bucket ROWS UNBOUNDED PRECEDING),
+               velocity AS (ORDER BY julianday(b.bucket) RANGE BETWEEN :span PRECEDING AND CURRENT ROW)
+        ORDER BY b.bucket
+    ''', {
+        'format': bucket_format,
+        'since': f'-{int(days)} days',
+        'window': ANALYTICS_VELOCITY_WINDOW,
+        'span': (ANALYTICS_VELOCITY_WINDOW - 1) * bucket_days
+    }).fetchall()
+    return [dict(row) for row in rows]
+
+def build_projection(conn, deadline, today=None):
+    """Linear projection to the deadline from the daily pace of the last ANALYTICS_VELOCITY_WINDOW days"""
+    if deadline is None:
+        return None
+    today = today or datetime.now().date()
+    row = conn.execute('''
+        SELECT COUNT(*) AS registrations,
+               COALESCE(SUM(persons_adults + COALESCE(persons_children, 0)), 0) AS persons,
+               COALESCE(SUM(total_amount), 0) AS revenue,
+               COUNT(*) FILTER (WHERE registered_at >= datetime('now', :since)) AS recent_registrations,
+               COALESCE(SUM(persons_adults + COALESCE(persons_children, 0)) FILTER (WHERE registered_at >= datetime('now', :since)), 0) AS recent_persons,
+               COALESCE(SUM(total_amount) FILTER (WHERE registered_at >= datetime('now', :since)), 0) AS recent_revenue
+        FROM registrations
+        WHERE payment_status != 'cancelled'
+    ''', {'since': f'-{ANALYTICS_VELOCITY_WINDOW} days'}).fetchone()
+    days_left = max((deadline - today).days, 0)
+    factor = days_left / ANALYTICS_VELOCITY_WINDOW
+    return {
+        'deadline': deadline.isoformat(),
+        'days_left': days_left,
+        'registrations': round(row['registrations'] + row['recent_registrations'] * factor),
+        'persons': round(row['persons'] + row['recent_persons'] * factor),
+        'revenue': round(row['revenue'] + row['recent_revenue'] * factor, 2)
+    }
+
+def get_registration_analytics(bucket='day', days=None):
+    """Series for one bucket size plus the projection, cached until the next change (or the TTL)"""
+    days = days or ANALYTICS_BUCKETS[bucket][1]
+
+    def build(conn):
+        return {
+            'bucket': bucket,
+            'days': days,
+            'series': build_registration_series(conn, bucket, days),
+            'projection': build_projection(conn, parse_deadline(get_config('bbq_deadline', '10 juni')))
+        }
+
+    return report_cache.get(('analytics', bucket, days), build, max_age=ANALYTICS_CACHE_TTL)
+
+# Public availability figures for the landing page. Cached in memory per worker and in a file
+# shared by all workers; at most one worker queries SQLite per AVAILABILITY_CACHE_TTL while
+# the others keep serving the previous figures (stale-while-revalidate)
+AVAILABILITY_CACHE_TTL = float(os.getenv('AVAILABILITY_CACHE_TTL', 2))
+AVAILABILITY_STALE_SECONDS = 30  # how long a stale copy may be served while another worker refreshes it
+AVAILABILITY_CACHE_FILE = os.getenv('AVAILABILITY_CACHE_FILE', os.path.join(
+    tempfile.gettempdir(),
+    f"bbq-availability-{hashlib.sha1(os.path.abspath(DATABASE).encode()).hexdigest()[:12]}.json"
+))
+
+def build_availability(conn):
+    """Households and persons registered (cancellations excluded) against the configured capacity"""
+    row = conn.execute('''
+        SELECT COUNT(*) AS households,
+               COALESCE(SUM(persons_adults + COALESCE(persons_children, 0)), 0) AS persons
+        FROM registrations
+        WHERE payment_status != 'cancelled'
+    ''').fetchone()
+    try:
+        capacity = max(0, int(get_config_value('max_persons', '0') or 0))
+    except ValueError:
+        capacity = 0
+    return {
+        'open': get_config_value('not_planned_mode', '0') != '1',
+        'households': row['households'],
+        'persons': row['persons'],
+        'capacity': capacity or None,
+        'spots_left': max(0, capacity - row['persons']) if capacity else None
+    }
+
+class AvailabilityCache:
+    def __init__(self, path, ttl, stale):
+        self.path = path
+        self.ttl = ttl
+        self.stale = stale
+        self.lock = threading.Lock()
+        self.entry = None  # (body, etag, computed_at)
+
+    def _read_shared(self):
+        try:
+            with open(self.path, 'rb') as f:
+                computed_at = os.fstat(f.fileno()).st_mtime
+                body = f.read()
+        except OSError:
+            return None
+        return body, hashlib.sha1(body).hexdigest()[:16], computed_at
+
+    def _refresh(self, publish):
+        with db_pool.get_connection() as conn:
+            data = build_availability(conn)
+        body = json.dumps(data, separators=(',', ':')).encode()
+        entry = (body, hashlib.sha1(body).hexdigest()[:16], time.time())
+        if publish:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, self.path)
+        self.entry = entry
+        return entry
+
+    def get(self):
+        """(body, etag) of the current figures; recomputes only when every copy is too old"""
+        entry = self.entry
+        if entry is not None and time.time() - entry[2] < self.ttl:
+            return entry[:2]
+        shared = self._read_shared()
+        if shared is not None and (entry is None or shared[2] > entry[2]):
+            entry = shared
+            self.entry = shared
+        if entry is not None and time.time() - entry[2] < self.ttl:
+            return entry[:2]
+        usable = entry is not None and time.time() - entry[2] < self.stale
+
+        # One thread per worker refreshes; the others serve the stale copy meanwhile
+        if not self.lock.acquire(blocking=not usable):
+            return entry[:2]
+        try:
+            if self.entry is not entry and time.time() - self.entry[2] < self.ttl:
+                return self.entry[:2]  # refreshed by another thread while we waited
+            if fcntl is None:
+                return self._refresh(publish=True)[:2]
+            with open(self.path + '.lock', 'a') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Another worker is refreshing: serve stale, or compute privately when nothing usable is cached
+                    return entry[:2] if usable else self._refresh(publish=False)[:2]
+                try:
+                    shared = self._read_shared()
+                    if shared is not None and time.time() - shared[2] < self.ttl:
+                        self.entry = shared
+                        return shared[:2]
+                    return self._refresh(publish=True)[:2]
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            self.lock.release()
+
+availability_cache = AvailabilityCache(AVAILABILITY_CACHE_FILE, AVAILABILITY_CACHE_TTL, AVAILABILITY_STALE_SECONDS)
+
+# Versioned schema migrations: migrations/NNNN_name.sql, applied in order exactly once
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+def load_migrations():
+    """Return [(version, name, sql)] for all migration scripts, ordered by version"""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r'^(\d+)_(\w+)\.sql$', filename)
+        if not match:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename), encoding='utf-8') as f:
+            migrations.append((int(match.group(1)), match.group(2), f.read()))
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Dubbel migratienummer in {MIGRATIONS_DIR}")
+    return migrations
+
+def _split_sql_statements(script):
+    """Split a script into complete statements (trigger bodies stay intact)"""
+    statements, buffer = [], ''
+    for line in script.splitlines(keepends=True):
+        if not buffer and (not line.strip() or line.lstrip().startswith('--')):
+            continue
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ''
+    if buffer.strip():
+        raise ValueError(f"Onvolledig SQL statement in migratie: {buffer.strip()[:60]}")
+    return statements
+
+def get_applied_migrations(conn):
+    """Return {version: applied_at} from schema_version (empty for a new database)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return {row[0]: row[1] for row in conn.execute('SELECT version, applied_at FROM schema_version')}
+
+def check_username_case_duplicates(conn):
+    """Refuse migration 0006 while usernames differ only by case (the NOCASE index would fail)"""
+    conflicts = conn.execute(
+        "SELECT group_concat(username, ', ') FROM users GROUP BY username COLLATE NOCASE HAVING COUNT(*) > 1"
+    ).fetchall()
+    if conflicts:
+        names = '; '.join(row[0] for row in conflicts)
+        raise RuntimeError(
+            f"Migratie 0006 afgebroken: gebruikersnamen verschillen alleen in hoofdletters ({names}). "
+            "Hernoem of verwijder deze gebruikers en voer `flask db upgrade` opnieuw uit."
+        )
+
+# Checks run before a migration script; they raise with a readable message instead of a bare IntegrityError
+MIGRATION_CHECKS = {6: check_username_case_duplicates}
+
+def run_migrations(conn):
+    """Apply pending migrations under an exclusive lock; returns the applied versions.
+
+    The whole run is one transaction: concurrent upgraders wait on the lock
+    and then find nothing left to do, and a failing script leaves the
+    database at its previous version.
+    """
+    migrations = load_migrations()
+    conn.isolation_level = None  # manual transaction control, DDL included
+    conn.execute('BEGIN EXCLUSIVE')
+    try:
+        applied = get_applied_migrations(conn)
+        pending = [m for m in migrations if m[0] not in applied]
+        for version, name, script in pending:
+            logger.info(f"Migratie {version:04d}_{name} wordt toegepast")
+            if version in MIGRATION_CHECKS:
+                MIGRATION_CHECKS[version](conn)
+            for statement in _split_sql_statements(script):
+                conn.execute(statement)
+            conn.execute('INSERT INTO schema_version (version, name) VALUES (?, ?)', (version, name))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.isolation_level = ''
+    return [version for version, _, _ in pending]
+
+def upgrade_database():
+    """Migrate the schema and seed defaults once, before workers start.
+
+    Called by `flask db upgrade`, the Gunicorn on_starting hook and the
+    development server. Uses its own short-lived connection so no pooled
+    connection is opened in the Gunicorn master.
+    """
+    conn = db_pool.create_connection()
+    try:
+        enable_incremental_vacuum(conn)
+        applied = run_migrations(conn)
+        # Initialize default configuration
+        initialize_default_config(conn)
+        # Voeg een standaard admin gebruiker toe als deze nog niet bestaat
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM users WHERE username = ?", ('admin',))
+        cursor.execute("SELECT COUNT(*) FROM users WHERE username = ? COLLATE NOCASE", ('admin',))
         if cursor.fetchone()[0] == 0:
             admin_password = os.getenv('ADMIN_PASSWORD', 'admin123')
-            hashed_password = generate_password_hash(admin_password, method='pbkdf2:sha256')
+            hashed_password = hash_password(admin_password)
             cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", ('admin', hashed_password))
-            conn.commit()
             logger.info("Standaard admin gebruiker 'admin' aangemaakt. Wachtwoord is in .env of 'admin123'.")
             logger.warning("Verander 'admin123' in een sterk wachtwoord in je .env bestand!")
+        conn.commit()
+    finally:
+        conn.close()
+    config_cache.invalidate()
+    return applied
+
+
+@bp.cli.command('rate-limit-stats')
+def rate_limit_stats_command():
+    """Show how many requests each rate limit rule has rejected."""
+    for rule, (capacity, refill_rate) in RATE_LIMITS.items():
+        click.echo(f"{rule}: {capacity} per {capacity / refill_rate:.0f}s")
+    rejections = get_rate_limit_rejections()
+    if not rejections:
+        click.echo('Nog geen verzoeken geweigerd.')
+    for row in rejections:
+        click.echo(f"{row['rule']}: {row['rejected']} geweigerd (laatst {row['last_rejected_at']})")
+
+
+@bp.cli.group('db')
+def db_cli():
+    """Database schema management."""
+
+
+@db_cli.command('upgrade')
+def db_upgrade_command():
+    """Apply pending schema migrations and seed default configuration."""
+    try:
+        applied = upgrade_database()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    if applied:
+        click.echo(f"Migraties toegepast: {', '.join(f'{v:04d}' for v in applied)}")
+    else:
+        click.echo('Database is up-to-date.')
+
+
+@db_cli.command('status')
+def db_status_command():
+    """List migrations and whether they have been applied."""
+    conn = db_pool.create_connection()
+    try:
+        applied = get_applied_migrations(conn)
+    finally:
+        conn.close()
+    for version, name, _ in load_migrations():
+        state = f"toegepast op {applied[version]}" if version in applied else 'openstaand'
+        click.echo(f"{version:04d}_{name}: {state}")
+
+
+@bp.cli.command('check-totals')
+@click.option('--no-repair', is_flag=True, help='Alleen controleren, de samenvatting niet herbouwen.')
+def check_totals_command(no_repair):
+    """Verify the registration_totals summary row against a full recount."""
+    stored, actual = check_registration_totals(repair=not no_repair)
+    mismatches = [
+        column for column in TOTALS_COLUMNS
+        if round(stored[column] - actual[column], 2) != 0
+    ]
+    for column in TOTALS_COLUMNS:
+        marker = '  <-- afwijking' if column in mismatches else ''
+        click.echo(f"{column}: opgeslagen={stored[column]} werkelijk={actual[column]}{marker}")
+    if not mismatches:
+        click.echo('Registratietotalen zijn consistent.')
+    elif no_repair:
+        click.echo(f"{len(mismatches)} afwijking(en) gevonden; draai zonder --no-repair om te herstellen.")
+        raise SystemExit(1)
+    else:
+        click.echo(f"{len(mismatches)} afwijking(en) gevonden en hersteld.")
+
+
+# Background jobs: every worker runs a scheduler thread; a lease row in scheduled_jobs
+# makes sure each due run happens in only one of them
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', '1') == '1'
+SCHEDULER_TICK = int(os.getenv('SCHEDULER_TICK', 30))
+
+def acquire_job_lease(name, interval, lease_seconds, force=False):
+    """Claim a due job for this process; False when it is not due or runs elsewhere"""
+    now = time.time()
+    with db_pool.get_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('INSERT OR IGNORE INTO scheduled_jobs (name) VALUES (?)', (name,))
+        row = conn.execute(
+            'SELECT lease_expires_at, last_started_at FROM scheduled_jobs WHERE name = ?', (name,)
+        ).fetchone()
+        due = force or row['last_started_at'] is None or now - row['last_started_at'] >= interval
+        if row['lease_expires_at'] > now or not due:
+            conn.rollback()
+            return False
+        conn.execute(
+            'UPDATE scheduled_jobs SET lease_owner = ?, lease_expires_at = ?, last_started_at = ? WHERE name = ?',
+            (f"{socket.gethostname()}:{os.getpid()}", now + lease_seconds, now, name)
+        )
+        conn.commit()
+    return True
+
+def run_job(name, func, interval=0, lease_seconds=600, force=False):
+    """Run func() when the job is due and not running elsewhere.
+
+    Returns (status, detail): status is None when skipped, else 'ok' or 'error';
+    detail is func's return value or the error message.
+    """
+    if not acquire_job_lease(name, interval, lease_seconds, force):
+        return None, None
+    started = time.monotonic()
+    try:
+        detail, status = func(), 'ok'
+    except Exception as e:
+        logger.error(f"Achtergrondtaak {name} mislukt: {e}")
+        detail, status = str(e), 'error'
+    duration = time.monotonic() - started
+    with db_pool.get_connection() as conn:
+        conn.execute(
+            """UPDATE scheduled_jobs
+               SET lease_owner = NULL, lease_expires_at = 0, last_finished_at = ?, last_duration = ?,
+                   last_status = ?, last_detail = ?, run_count = run_count + 1
+               WHERE name = ?""",
+            (time.time(), duration, status, json.dumps(detail), name)
+        )
+        conn.commit()
+    logger.info(f"Achtergrondtaak {name}: {status} in {duration:.2f}s")
+    return status, detail
+
+def get_job_status(name):
+    """Last run of a job as a dict (detail decoded), or None when it never ran"""
+    with db_pool.get_connection() as conn:
+        row = conn.execute('SELECT * FROM scheduled_jobs WHERE name = ?', (name,)).fetchone()
+    if row is None:
+        return None
+    status = dict(row)
+    status['last_detail'] = json.loads(status['last_detail']) if status['last_detail'] else None
+    return status
+
+class JobScheduler:
+    def __init__(self):
+        self.jobs = []
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def add_job(self, name, interval, func, lease_seconds=600):
+        """Register func to run every interval seconds (interval <= 0 disables the job)"""
+        if interval > 0:
+            self.jobs.append((name, interval, func, lease_seconds))
+
+    def start(self):
+        """Start the scheduler thread; called per worker after the fork (see gunicorn.conf.py)"""
+        if not SCHEDULER_ENABLED or not self.jobs:
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stop_event.clear()
+                self.thread = threading.Thread(target=self._run, name='job-scheduler', daemon=True)
+                self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        while not self.stop_event.wait(SCHEDULER_TICK):
+            for name, interval, func, lease_seconds in self.jobs:
+                try:
+                    run_job(name, func, interval, lease_seconds)
+                except sqlite3.Error as e:
+                    logger.error(f"Planner kon taak {name} niet starten: {e}")
+
+scheduler = JobScheduler()
+
+# Online backups: Connection.backup copies pages in small steps while the app keeps writing
+BACKUP_DIR = os.getenv('BACKUP_DIR', os.path.join(os.path.dirname(os.path.abspath(DATABASE)), 'backups'))
+BACKUP_INTERVAL_HOURS = float(os.getenv('BACKUP_INTERVAL_HOURS', 24))
+BACKUP_RETENTION = int(os.getenv('BACKUP_RETENTION', 14))
+BACKUP_PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', 256))
+BACKUP_STEP_SLEEP = float(os.getenv('BACKUP_STEP_SLEEP', 0.005))
+BACKUP_PREFIX = 'bbq-backup-'
+
+def list_backups():
+    """Backup files, newest first"""
+    backups = []
+    for path in glob.glob(os.path.join(BACKUP_DIR, f'{BACKUP_PREFIX}*.db.gz')):
+        stat = os.stat(path)
+        backups.append({
+            'name': os.path.basename(path),
+            'path': path,
+            'size': stat.st_size,
+            'created': datetime.fromtimestamp(stat.st_mtime).strftime('%d-%m-%Y %H:%M:%S')
+        })
+    return sorted(backups, key=lambda backup: backup['name'], reverse=True)
+
+def create_backup():
+    """Write a compressed, timestamped snapshot of the live database and apply retention.
+
+    Pages are copied BACKUP_PAGES_PER_STEP at a time with a short pause in
+    between, so registrations keep getting the write lock. A write during the
+    copy makes SQLite restart it; after a few restarts the pauses are dropped
+    so the copy always finishes.
+    """
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    started = time.monotonic()
+    progress_state = {'remaining': None, 'restarts': 0, 'steps': 0}
+
+    def progress(status, remaining, total):
+        if progress_state['remaining'] is not None and remaining > progress_state['remaining']:
+            progress_state['restarts'] += 1
+        progress_state['remaining'] = remaining
+        progress_state['steps'] += 1
+        if remaining and progress_state['restarts'] < 3:
+            time.sleep(BACKUP_STEP_SLEEP)
+
+    fd, snapshot_path = tempfile.mkstemp(dir=BACKUP_DIR, suffix='.db.tmp')
+    os.close(fd)
+    compressed_path = snapshot_path + '.gz'
+    try:
+        source = sqlite3.connect(DATABASE, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+        target = sqlite3.connect(snapshot_path)
+        try:
+            source.backup(target, pages=BACKUP_PAGES_PER_STEP, progress=progress)
+            check = target.execute('PRAGMA quick_check').fetchone()[0]
+            pages = target.execute('PRAGMA page_count').fetchone()[0]
+        finally:
+            target.close()
+            source.close()
+        if check != 'ok':
+            raise sqlite3.DatabaseError(f"Back-up is beschadigd: {check}")
+
+        with open(snapshot_path, 'rb') as raw, gzip.open(compressed_path, 'wb', compresslevel=6) as packed:
+            shutil.copyfileobj(raw, packed, 1024 * 1024)
+        name = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S')}.db.gz"
+        os.replace(compressed_path, os.path.join(BACKUP_DIR, name))
+    finally:
+        for path in (snapshot_path, compressed_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # Retention: keep the newest BACKUP_RETENTION snapshots
+    for old_backup in list_backups()[BACKUP_RETENTION:]:
+        os.remove(old_backup['path'])
+        logger.info(f"Oude back-up verwijderd: {old_backup['name']}")
+
+    detail = {
+        'file': name,
+        'size': os.path.getsize(os.path.join(BACKUP_DIR, name)),
+        'pages': pages,
+        'steps': progress_state['steps'],
+        'restarts': progress_state['restarts'],
+        'seconds': round(time.monotonic() - started, 3)
+    }
+    logger.info(f"Back-up gemaakt: {name} ({detail['size']} bytes, {pages} pagina's, {detail['steps']} stappen)")
+    return detail
 
+def restore_backup(path):
+    """Verify a backup and copy it over the live database; returns the integrity check result.
+
+    The copy goes through the backup API as well, so the live database keeps
+    a consistent WAL and other connections never see a half-written file.
+    """
+    fd, snapshot_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(DATABASE)), suffix='.restore.tmp')
+    os.close(fd)
+    try:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as packed, open(snapshot_path, 'wb') as raw:
+            shutil.copyfileobj(packed, raw, 1024 * 1024)
+        source = sqlite3.connect(snapshot_path)
+        try:
+            check = source.execute('PRAGMA integrity_check').fetchone()[0]
+            if check != 'ok':
+                raise sqlite3.DatabaseError(f"Back-up is beschadigd: {check}")
+            if source.execute("SELECT 1 FROM sqlite_master WHERE name = 'schema_version'").fetchone() is None:
+                raise sqlite3.DatabaseError('Bestand is geen BBQ-App database.')
+            target = sqlite3.connect(DATABASE, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+            try:
+                source.backup(target)
+                result = target.execute('PRAGMA integrity_check').fetchone()[0]
+            finally:
+                target.close()
+        finally:
+            source.close()
+    finally:
+        os.remove(snapshot_path)
+    db_pool.close_all()
+    config_cache.invalidate()
+    return result
+
+scheduler.add_job('backup', BACKUP_INTERVAL_HOURS * 3600, create_backup)
+
+
+@bp.cli.group('backup')
+def backup_cli():
+    """Database backups."""
+
+
+@backup_cli.command('create')
+def backup_create_command():
+    """Write a backup now."""
+    status, detail = run_job('backup', create_backup, force=True)
+    if status is None:
+        raise click.ClickException('Er loopt al een back-up.')
+    if status != 'ok':
+        raise click.ClickException(f"Back-up mislukt: {detail}")
+    click.echo(f"Back-up gemaakt: {os.path.join(BACKUP_DIR, detail['file'])} ({detail['size']} bytes)")
+
+
+@backup_cli.command('list')
+def backup_list_command():
+    """List the available backups, newest first."""
+    backups = list_backups()
+    if not backups:
+        click.echo(f"Geen back-ups gevonden in {BACKUP_DIR}.")
+    for backup in backups:
+        click.echo(f"{backup['name']}  {backup['size']:>10} bytes  {backup['created']}")
+
+
+@backup_cli.command('restore')
+@click.argument('backup')
+@click.option('--yes', is_flag=True, help='Niet om bevestiging vragen.')
+def backup_restore_command(backup, yes):
+    """Verify BACKUP (a file name from `backup list` or a path) and restore it over the live database.
+
+    Stop the application first; restored data replaces everything in the database.
+    """
+    path = backup if os.path.exists(backup) else os.path.join(BACKUP_DIR, backup)
+    if not os.path.exists(path):
+        raise click.ClickException(f"Back-up niet gevonden: {backup}")
+    if not yes:
+        click.confirm(f"Database {DATABASE} overschrijven met {path}?", abort=True)
+    try:
+        result = restore_backup(path)
+    except (sqlite3.Error, OSError, EOFError) as e:
+        raise click.ClickException(f"Herstellen mislukt: {e}")
+    click.echo(f"Database hersteld uit {path} (integrity_check: {result}).")
+
+
+# Database maintenance: WAL checkpoints, planner statistics and incremental vacuum, run by one worker at a time
+MAINTENANCE_INTERVAL = int(os.getenv('MAINTENANCE_INTERVAL', 60))
+MAINTENANCE_IDLE_SECONDS = int(os.getenv('MAINTENANCE_IDLE_SECONDS', 120))
+MAINTENANCE_BUSY_TIMEOUT_MS = 250  # maintenance gives way to requests instead of queueing behind them
+OPTIMIZE_INTERVAL_HOURS = float(os.getenv('OPTIMIZE_INTERVAL_HOURS', 6))
+ANALYSIS_LIMIT = 1000  # rows sampled per index by ANALYZE
+VACUUM_PAGES_PER_RUN = int(os.getenv('VACUUM_PAGES_PER_RUN', 1000))
+# Since SQLite 3.46 PRAGMA optimize can check every table from a fresh connection
+SQLITE_OPTIMIZE_ALL_TABLES = sqlite3.sqlite_version_info >= (3, 46, 0)
+
+def get_wal_size():
+    """Size of the -wal file in bytes (0 when there is none)"""
+    try:
+        return os.path.getsize(DATABASE + '-wal')
+    except OSError:
+        return 0
+
+def get_database_stats(conn):
+    """File and page statistics of the live database"""
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    return {
+        'page_size': page_size,
+        'page_count': page_count,
+        'freelist_count': conn.execute('PRAGMA freelist_count').fetchone()[0],
+        'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(conn.execute('PRAGMA auto_vacuum').fetchone()[0]),
+        'database_bytes': page_size * page_count,
+        'wal_bytes': get_wal_size()
+    }
+
+def seconds_since_last_change(conn):
+    """Seconds since the newest change_log event, None when there is none"""
+    row = conn.execute(
+        "SELECT (julianday('now') - julianday(created_at)) * 86400 FROM change_log ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    return row[0] if row else None
+
+def enable_incremental_vacuum(conn):
+    """Switch the database to auto_vacuum=INCREMENTAL; returns True when it was converted.
+
+    Once the file exists (and in WAL mode it always does) the setting only
+    takes effect after a VACUUM, which rewrites the whole file once. Runs from
+    upgrade_database(), before any worker starts.
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    started = time.monotonic()
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute('VACUUM')
+    logger.info(f"Database omgezet naar incrementeel vacuum in {time.monotonic() - started:.2f}s")
+    return True
+
+def run_database_maintenance(force_idle=False):
+    """Checkpoint a large WAL and, when the app is idle, return free pages to the file system.
+
+    A PASSIVE checkpoint never waits for readers or writers. The incremental
+    vacuum and a TRUNCATE checkpoint (which also shrinks the -wal file) take
+    the write lock, so they only run once nothing has changed for
+    MAINTENANCE_IDLE_SECONDS.
+    """
+    conn = sqlite3.connect(DATABASE, timeout=MAINTENANCE_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    try:
+        conn.execute(f'PRAGMA busy_timeout={MAINTENANCE_BUSY_TIMEOUT_MS}')
+        quiet_for = seconds_since_last_change(conn)
+        idle = force_idle or quiet_for is None or quiet_for >= MAINTENANCE_IDLE_SECONDS
+        before = get_database_stats(conn)
+        actions = []
+
+        if idle and before['auto_vacuum'] == 'incremental' and before['freelist_count']:
+            started = time.monotonic()
+            try:
+                # Every step of the statement frees one page; execute() would stop after the
+                # first step, executescript() runs it to the end
+                conn.executescript(f'PRAGMA incremental_vacuum({VACUUM_PAGES_PER_RUN})')
+                actions.append({
+                    'action': 'incremental_vacuum',
+                    'pages': before['freelist_count'] - conn.execute('PRAGMA freelist_count').fetchone()[0],
+                    'seconds': round(time.monotonic() - started, 4)
+                })
+            except sqlite3.OperationalError as e:
+                # Busy: a request took the write lock first; try again next run
+                actions.append({'action': 'incremental_vacuum', 'skipped': str(e)})
+
+        wal_bytes = get_wal_size()
+        if wal_bytes > WAL_CHECKPOINT_MB * 1024 * 1024 or (idle and wal_bytes):
+            mode = 'TRUNCATE' if idle else 'PASSIVE'
+            started = time.monotonic()
+            busy, log_frames, checkpointed = conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+            actions.append({
+                'action': 'checkpoint', 'mode': mode, 'busy': bool(busy), 'log_frames': log_frames,
+                'checkpointed_frames': checkpointed, 'seconds': round(time.monotonic() - started, 4)
+            })
+
+        after = get_database_stats(conn)
+    finally:
+        conn.close()
+    return {
+        'idle': idle,
+        'quiet_seconds': round(quiet_for) if quiet_for is not None else None,
+        'actions': actions,
+        'before': before,
+        'after': after
+    }
+
+def optimize_database():
+    """Refresh the query planner statistics (ANALYZE where needed)"""
+    conn = sqlite3.connect(DATABASE, timeout=DB_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    try:
+        conn.execute(f'PRAGMA analysis_limit={ANALYSIS_LIMIT}')
+        started = time.monotonic()
+        if SQLITE_OPTIMIZE_ALL_TABLES:
+            statement = 'PRAGMA optimize=0x10002'
+        else:
+            # Older SQLite only optimizes tables this connection has queried, which is none
+            statement = 'ANALYZE'
+        conn.execute(statement)
+        return {'statement': statement, 'seconds': round(time.monotonic() - started, 4)}
+    finally:
+        conn.close()
+
+def get_database_metrics():
+    """Database statistics plus the last run of every background job, for /api/admin/metrics"""
+    with db_pool.get_connection() as conn:
+        database = get_database_stats(conn)
+        jobs = conn.execute('SELECT name FROM scheduled_jobs ORDER BY name').fetchall()
+    return {'database': database, 'jobs': {row['name']: get_job_status(row['name']) for row in jobs}}
+
+scheduler.add_job('db-maintenance', MAINTENANCE_INTERVAL, run_database_maintenance, lease_seconds=300)
+scheduler.add_job('db-optimize', OPTIMIZE_INTERVAL_HOURS * 3600, optimize_database)
+
+
+@db_cli.command('maintenance')
+@click.option('--idle', is_flag=True, help='Ook de stappen uitvoeren die normaal op een rustig moment wachten.')
+def db_maintenance_command(idle):
+    """Run the database maintenance and optimize jobs now and print what they did."""
+    for name, func in (('db-maintenance', lambda: run_database_maintenance(force_idle=idle)),
+                       ('db-optimize', optimize_database)):
+        status, detail = run_job(name, func, force=True)
+        if status is None:
+            click.echo(f"{name}: loopt al in een andere worker.")
+        else:
+            click.echo(f"{name}: {status} {json.dumps(detail)}")
+
+
+@db_cli.command('stats')
+def db_stats_command():
+    """Show database size, WAL size, free pages and the last background job runs."""
+    metrics = get_database_metrics()
+    for key, value in metrics['database'].items():
+        click.echo(f"{key}: {value}")
+    for name, status in metrics['jobs'].items():
+        if status['last_finished_at']:
+            finished = datetime.fromtimestamp(status['last_finished_at']).strftime('%d-%m-%Y %H:%M:%S')
+            click.echo(f"{name}: {status['last_status']} op {finished} in {status['last_duration']:.3f}s ({status['run_count']}x)")
+
+
+# Synthetic registrations for scale tests (`flask seed`); the same --seed always yields the same rows
+SEED_FIRST_NAMES = ['Anna', 'Bas', 'Daan', 'Emma', 'Eva', 'Femke', 'Floor', 'Jan', 'Joris', 'Julia', 'Kees', 'Lars',
+                    'Lisa', 'Lotte', 'Maarten', 'Marieke', 'Mark', 'Noah', 'Noor', 'Peter', 'Ruben', 'Sanne', 'Sem',
+                    'Sophie', 'Thijs', 'Tim', 'Wim', 'Yvonne']
+SEED_LAST_NAMES = ['de Vries', 'Jansen', 'van den Berg', 'Bakker', 'Visser', 'Smit', 'Meijer', 'de Boer', 'Mulder',
+                   'de Groot', 'Bos', 'Vos', 'Peters', 'Hendriks', 'van Leeuwen', 'Dekker', 'Brouwer', 'de Wit',
+                   'Dijkstra', 'de Graaf', 'van der Meer', 'Kok', 'Jacobs', 'de Haan', 'Vermeulen', 'van den Broek']
+# (value, weight) pairs; notes reuse the wording the diet tag patterns are written for
+SEED_ADULTS = [(1, 25), (2, 55), (3, 10), (4, 7), (5, 2), (6, 1)]
+SEED_CHILDREN = [(0, 50), (1, 18), (2, 20), (3, 9), (4, 3)]
+SEED_STATUSES = [('paid', 60), ('pending', 35), ('cancelled', 5)]
+SEED_NOTES = [('', 70), ('geen', 5), ('Notenallergie', 4), ('Glutenvrij graag', 3), ('Vegetarisch', 4),
+              ('Lactose-intolerant', 2), ('Geen varkensvlees', 2), ('Halal', 1), ('Veganistisch', 1),
+              ('Pinda-allergie bij de jongste', 2), ('Diabetes', 1), ('Geen vis', 1), ('Schaaldierenallergie', 1),
+              ('Wij komen iets later', 2), ('Nemen zelf stoelen mee', 1)]
+# Sign-ups per hour of the day: quiet nights, a lunch bump and an evening peak
+SEED_HOUR_WEIGHTS = [1, 1, 1, 1, 1, 1, 2, 4, 6, 6, 6, 7, 9, 8, 6, 6, 7, 9, 12, 14, 14, 11, 6, 3]
+
+SEED_CONFIG_VARIANTS = {
+    'bunq': {'payment_method': 'bunq', 'bunq_me_link': 'https://bunq.me/BuurtBBQ'},
+    'digest': {'organizer_notification_mode': 'digest'},
+    'expensive': {'price_per_adult': '45', 'price_per_child': '20'},
+    'free': {'price_per_adult': '0', 'price_per_child': '0'},
+    'not-planned': {'not_planned_mode': '1'},
+    # max_persons is set to the seeded headcount afterwards
+    'sold-out': {},
+}
+
+def _seed_sampler(rng, pairs):
+    """Return a function that draws from (value, weight) pairs with rng"""
+    values = [value for value, _ in pairs]
+    cum_weights = list(itertools.accumulate(weight for _, weight in pairs))
+    return lambda: rng.choices(values, cum_weights=cum_weights)[0]
+
+def _seed_day_counts(count, days):
+    """Spread count sign-ups over the days: a burst after the announcement, a rush before the deadline"""
+    weights = [1 + 3 * 0.6 ** day + 4 * 0.5 ** (days - 1 - day) for day in range(days)]
+    total = sum(weights)
+    counts = [int(count * weight / total) for weight in weights]
+    for day in sorted(range(days), key=lambda d: weights[d], reverse=True)[:count - sum(counts)]:
+        counts[day] += 1
+    return counts
+
+def generate_seed_registrations(count, seed, start_ts, days, price_per_adult, price_per_child, bunq_me_link=''):
+    """Yield registration rows in registered_at order, ready for the INSERT in seed_registrations()"""
+    rng = random.Random(seed)
+    adults, children = _seed_sampler(rng, SEED_ADULTS), _seed_sampler(rng, SEED_CHILDREN)
+    statuses, notes = _seed_sampler(rng, SEED_STATUSES), _seed_sampler(rng, SEED_NOTES)
+    hours = list(range(24))
+    hour_cum_weights = list(itertools.accumulate(SEED_HOUR_WEIGHTS))
+    number = 0
+    for day, day_count in enumerate(_seed_day_counts(count, days)):
+        day_ts = start_ts + day * 86400
+        moments = sorted(
+            day_ts + hour * 3600 + rng.randrange(3600)
+            for hour in rng.choices(hours, cum_weights=hour_cum_weights, k=day_count)
+        )
+        for moment in moments:
+            number += 1
+            first, last = rng.choice(SEED_FIRST_NAMES), rng.choice(SEED_LAST_NAMES)
+            name = f"{first} {last}"
+            house_number = str(rng.randint(1, 250)) + ('A' if rng.random() < 0.1 else '')
+            email = '' if rng.random() < 0.08 else f"{first}.{last.replace(' ', '')}{number}@example.nl".lower()
+            persons_adults, persons_children = adults(), children()
+            total_amount = persons_adults * price_per_adult + persons_children * price_per_child
+            status = statuses()
+            paid_amount = total_amount if status == 'paid' else 0.0
+            payment_url = ''
+            if bunq_me_link:
+                description = f"BBQ {name} - Huisnr: {house_number}"
+                payment_url = f"{bunq_me_link}/{total_amount:.2f}/{description.replace(' ', '%20')}"
+            yield (name, house_number, email, persons_adults, persons_children, notes(), total_amount,
+                   payment_url, status, paid_amount, time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(moment)))
+
+def seed_registrations(count, seed=42, days=30, end=None, batch_size=50000, reset=False, progress=None):
+    """Bulk-insert synthetic registrations on a dedicated connection; returns the number inserted.
+
+    Runs with synchronous=OFF (this connection only) and commits per batch_size rows, so the WAL
+    stays bounded. The triggers keep totals, search index and diet tags current as usual.
+    """
+    end = end or datetime.now()
+    start_ts = (datetime(end.year, end.month, end.day) - datetime(1970, 1, 1)).total_seconds() - (days - 1) * 86400
+    price_per_adult = float(get_config('price_per_adult', '25'))
+    price_per_child = float(get_config('price_per_child', '12'))
+    bunq_me_link = get_config('bunq_me_link', '') if get_config('payment_method', 'none') == 'bunq' else ''
+    rows = generate_seed_registrations(count, seed, int(start_ts), days, price_per_adult, price_per_child, bunq_me_link)
+
+    conn = db_pool.create_connection()
+    try:
+        conn.execute('PRAGMA synchronous=OFF')
+        if reset:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM registrations')
+            conn.commit()
+        inserted = 0
+        while inserted < count:
+            batch = list(itertools.islice(rows, batch_size))
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                '''INSERT INTO registrations (name, house_number, email, persons_adults, persons_children, allergies_notes,
+                                              total_amount, bunq_me_url, payment_status, paid_amount, registered_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                batch
+            )
+            inserted += len(batch)
+            if inserted >= count:
+                # Synthetic rows are not news for the organizer, and caches must see the new data
+                conn.execute('UPDATE organizer_digest SET last_registration_id = (SELECT MAX(id) FROM registrations) WHERE id = 1')
+                record_change(conn, 'registrations_seeded', {'count': inserted, 'seed': seed})
+            conn.commit()
+            if progress:
+                progress(inserted)
+        return inserted
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+@bp.cli.command('seed')
+@click.option('--count', '-n', default=1000, show_default=True, type=click.IntRange(1, 10_000_000),
+              help='Aantal aanmeldingen.')
+@click.option('--seed', 'seed', default=42, show_default=True, help='Startwaarde; dezelfde waarde geeft dezelfde data.')
+@click.option('--days', default=30, show_default=True, type=click.IntRange(1, 3650), help='Aanmeldperiode in dagen.')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help='Laatste dag van de aanmeldperiode (standaard vandaag).')
+@click.option('--batch-size', default=50000, show_default=True, type=click.IntRange(1), help='Rijen per transactie.')
+@click.option('--reset', is_flag=True, help='Eerst alle bestaande aanmeldingen verwijderen.')
+@click.option('--config', 'variants', multiple=True, type=click.Choice(sorted(SEED_CONFIG_VARIANTS)),
+              help='Configuratievariant toepassen (meerdere mogelijk).')
+def seed_command(count, seed, days, end, batch_size, reset, variants):
+    """Fill the database with synthetic registrations for scale and benchmark runs."""
+    for variant in variants:
+        update_config_values(SEED_CONFIG_VARIANTS[variant])
+    started = time.perf_counter()
+    inserted = seed_registrations(
+        count, seed=seed, days=days, end=end, batch_size=batch_size, reset=reset,
+        progress=lambda done: click.echo(f"{done}/{count} aanmeldingen ({done / (time.perf_counter() - started):.0f}/s)")
+    )
+    if 'sold-out' in variants:
+        with db_pool.get_connection() as conn:
+            persons = build_availability(conn)['persons']
+        update_config_values({'max_persons': str(persons)})
+    click.echo(f"{inserted} aanmeldingen aangemaakt in {time.perf_counter() - started:.1f}s (seed {seed}).")
+
+
+# Rate limiting: token buckets in SQLite, so the limits hold across all Gunicorn workers
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+def parse_rate_limit(value):
+    """Parse a limit like '10/minute' into (capacity, tokens per second)"""
+    count, _, period = value.partition('/')
+    capacity = int(count)
+    if capacity < 1 or period not in RATE_LIMIT_PERIODS:
+        raise ValueError(f"Ongeldige rate limit: {value!r} (verwacht bijv. '10/minute')")
+    return capacity, capacity / RATE_LIMIT_PERIODS[period]
+
+# Per-endpoint limits, overridable with RATE_LIMIT_<RULE> (e.g. RATE_LIMIT_LOGIN_IP=20/minute)
+RATE_LIMIT_DEFAULTS = {
+    'login_ip': '10/minute',
+    'login_user': '5/minute',
+    'register_ip': '10/minute',
+}
+RATE_LIMITS = {
+    rule: parse_rate_limit(os.getenv(f'RATE_LIMIT_{rule.upper()}', default))
+    for rule, default in RATE_LIMIT_DEFAULTS.items()
+}
+
+def check_rate_limit(rule, key):
+    """Take one token from the bucket for (rule, key).
+
+    Returns (allowed, retry_after_seconds). Fails open when the database
+    is unavailable, so the limiter can never lock admins out by itself.
+    """
+    if not RATE_LIMIT_ENABLED or not key:
+        return True, 0
+    capacity, refill_rate = RATE_LIMITS[rule]
+    bucket = f"{rule}:{key}"
+    now = time.time()
+    try:
+        with db_pool.get_connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket = ?', (bucket,)
+            ).fetchone()
+            tokens = capacity if row is None else min(capacity, row['tokens'] + (now - row['updated_at']) * refill_rate)
+            if tokens >= 1:
+                conn.execute(
+                    'INSERT OR REPLACE INTO rate_limit_buckets (bucket, tokens, updated_at) VALUES (?, ?, ?)',
+                    (bucket, tokens - 1, now)
+                )
+                allowed, retry_after = True, 0
+            else:
+                conn.execute('''
+                    INSERT INTO rate_limit_rejections (rule, rejected, last_rejected_at)
+                    VALUES (?, 1, CURRENT_TIMESTAMP)
+                    ON CONFLICT(rule) DO UPDATE SET
+                        rejected = rejected + 1,
+                        last_rejected_at = CURRENT_TIMESTAMP
+                ''', (rule,))
+                allowed, retry_after = False, int((1 - tokens) / refill_rate) + 1
+            # Occasionally drop buckets that have long been refilled
+            if random.random() < 0.01:
+                conn.execute('DELETE FROM rate_limit_buckets WHERE updated_at < ?', (now - 86400,))
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"Rate limiter niet beschikbaar ({rule}): {e}")
+        return True, 0
+    if not allowed:
+        logger.warning(f"Rate limit {rule} overschreden voor {key}")
+    return allowed, retry_after
+
+def get_rate_limit_rejections():
+    """Return rejection counters per rule"""
+    with db_pool.get_connection() as conn:
+        return [dict(row) for row in conn.execute(
+            'SELECT rule, rejected, last_rejected_at FROM rate_limit_rejections ORDER BY rule'
+        )]
+
+# Idempotent registrations: the first response for an Idempotency-Key is stored and replayed on retries
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 86400))
+IDEMPOTENCY_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_\-]{8,100}$')
+
+def get_idempotent_response(conn, key):
+    """Return the stored (status_code, body) for an unexpired key, or None"""
+    row = conn.execute(
+        'SELECT status_code, response_body FROM idempotency_keys WHERE key = ? AND created_at > ?',
+        (key, int(time.time()) - IDEMPOTENCY_KEY_TTL)
+    ).fetchone()
+    return (row['status_code'], row['response_body']) if row else None
+
+def store_idempotent_response(conn, key, status_code, body):
+    """Store a response in the caller's transaction and drop expired keys (caller commits)"""
+    now = int(time.time())
+    conn.execute('DELETE FROM idempotency_keys WHERE created_at <= ?', (now - IDEMPOTENCY_KEY_TTL,))
+    conn.execute(
+        'INSERT INTO idempotency_keys (key, status_code, response_body, created_at) VALUES (?, ?, ?, ?)',
+        (key, status_code, body, now)
+    )
+
+def replay_idempotent_response(stored):
+    """Build the HTTP response for a stored (status_code, body) pair"""
+    status_code, body = stored
+    return Response(body, status=status_code, mimetype='application/json', headers={'Idempotent-Replayed': 'true'})
+
+def find_duplicate_registration(conn, house_number, email):
+    """Return the id of an active registration with the same house number and e-mail, or None"""
+    # Matches idx_registrations_house_email, so this is an index lookup
+    row = conn.execute(
+        "SELECT id FROM registrations WHERE house_number = ? AND lower(email) = ? AND payment_status != 'cancelled' LIMIT 1",
+        (house_number, email.lower())
+    ).fetchone()
+    return row['id'] if row else None
+
+# Bank statement reconciliation: match incoming transfers to pending registrations
+# (bunq.me descriptions follow "BBQ {name} - Huisnr: {house_number}")
+HOUSE_NUMBER_REFERENCE = re.compile(r'huisnr\.?\s*:?\s*(\d+[a-z]?)\b', re.IGNORECASE)
+MATCH_STOPWORDS = {'bbq', 'huisnr', 'de', 'van', 'der', 'den', 'het', 'ter', 'te', 'en'}
+CSV_AMOUNT_COLUMNS = ('amount', 'bedrag', 'bedrag (eur)', 'transactiebedrag')
+CSV_DIRECTION_COLUMNS = ('af bij', 'af/bij', 'debit/credit')
+CSV_NAME_COLUMNS = ('name', 'naam', 'naam tegenpartij', 'naam / omschrijving', 'counterparty')
+CSV_DATE_COLUMNS = ('date', 'datum', 'boekdatum', 'transactiedatum', 'rentedatum')
+CSV_DESCRIPTION_PREFIXES = ('description', 'omschrijving', 'mededelingen')
+
+def parse_amount_cents(text):
+    """Parse a bank amount like '-1.234,56', '1,234.56' or '€ 25' into integer cents"""
+    value = text.replace('€', '').replace('EUR', '').replace(' ', '').replace('\xa0', '').strip()
+    if ',' in value and '.' in value:
+        # Whichever separator comes last is the decimal one
+        if value.rfind(',') > value.rfind('.'):
+            value = value.replace('.', '').replace(',', '.')
+        else:
+            value = value.replace(',', '')
+    elif ',' in value:
+        value = value.replace(',', '.')
+    try:
+        return int((Decimal(value) * 100).to_integral_value())
+    except InvalidOperation:
+        raise ValueError(f"Ongeldig bedrag: {text!r}")
+
+def parse_bank_csv(stream):
+    """Yield transactions from a bank CSV export.
+
+    Columns are found by their (Dutch or English) header names; the
+    delimiter is taken from the header line.
+    """
+    # Decoded in one go: before Python 3.11 the SpooledTemporaryFile behind an upload
+    # lacks readable(), so io.TextIOWrapper cannot wrap it (uploads are capped at 16 MB)
+    text = io.StringIO(stream.read().decode('utf-8-sig', 'replace'), newline='')
+    header_line = text.readline()
+    delimiter = max((';', ',', '\t'), key=header_line.count)
+    reader = csv.reader(itertools.chain([header_line], text), delimiter=delimiter)
+    header = [column.strip().lower() for column in next(reader, [])]
+
+    def find_column(names):
+        # First listed name wins, e.g. bunq's "Name" over its "Counterparty" IBAN column
+        return next((header.index(name) for name in names if name in header), None)
+
+    amount_col = find_column(CSV_AMOUNT_COLUMNS)
+    if amount_col is None:
+        raise ValueError('Geen kolom met het bedrag gevonden in het CSV-bestand.')
+    direction_col = find_column(CSV_DIRECTION_COLUMNS)
+    name_col = find_column(CSV_NAME_COLUMNS)
+    date_col = find_column(CSV_DATE_COLUMNS)
+    description_cols = [i for i, column in enumerate(header) if column.startswith(CSV_DESCRIPTION_PREFIXES) and i != name_col]
+
+    for line_number, row in enumerate(reader, start=2):
+        if len(row) <= amount_col:
+            continue
+        try:
+            amount_cents = parse_amount_cents(row[amount_col])
+        except ValueError:
+            yield {'line': line_number, 'error': f"Ongeldig bedrag: {row[amount_col]}"}
+            continue
+        if direction_col is not None and row[direction_col].strip().lower() in ('af', 'debit', 'd'):
+            amount_cents = -abs(amount_cents)
+        yield {
+            'line': line_number,
+            'date': row[date_col].strip() if date_col is not None and date_col < len(row) else '',
+            'name': row[name_col].strip() if name_col is not None and name_col < len(row) else '',
+            'description': ' '.join(row[i].strip() for i in description_cols if i < len(row)),
+            'amount_cents': amount_cents
+        }
+
+def parse_camt053(stream):
+    """Yield transactions from a CAMT.053 XML statement, clearing each entry once read"""
+    entry_number = 0
+    for event, element in ET.iterparse(stream, events=('end',)):
+        if element.tag.rsplit('}', 1)[-1] != 'Ntry':
+            continue
+        entry_number += 1
+        try:
+            amount_cents = parse_amount_cents(element.findtext('{*}Amt', ''))
+        except ValueError:
+            yield {'line': entry_number, 'error': 'Ongeldig bedrag in CAMT-boeking'}
+            element.clear()
+            continue
+        if element.findtext('{*}CdtDbtInd', '') == 'DBIT':
+            amount_cents = -amount_cents
+        yield {
+            'line': entry_number,
+            'date': element.findtext('{*}BookgDt/{*}Dt') or element.findtext('{*}BookgDt/{*}DtTm', ''),
+            'name': element.findtext('.//{*}RltdPties/{*}Dbtr//{*}Nm', ''),
+            'description': ' '.join(ustrd.text or '' for ustrd in element.iterfind('.//{*}RmtInf/{*}Ustrd')),
+            'amount_cents': amount_cents
+        }
+        element.clear()
+
+def parse_bank_statement(file):
+    """Pick the CSV or CAMT.053 parser for an uploaded statement"""
+    head = file.stream.read(64)
+    file.stream.seek(0)
+    if file.filename.lower().endswith('.xml') or head.lstrip(b'\xef\xbb\xbf \r\n\t').startswith(b'<'):
+        return parse_camt053(file.stream)
+    return parse_bank_csv(file.stream)
+
+def _match_tokens(text):
+    return set(re.findall(r'\w+', text.lower())) - MATCH_STOPWORDS
+
+def match_bank_transactions(transactions, registrations):
+    """Propose one pending registration per incoming transfer.
+
+    Registrations are indexed on (amount in cents, name token / house number),
+    so each transfer only scores the few registrations sharing its amount and
+    a token. Each transfer and each registration is used at most once.
+    Returns (proposals, unmatched, stats).
+    """
+    index = defaultdict(set)
+    registrations_by_id = {}
+    for reg in registrations:
+        amount_cents = round(reg['total_amount'] * 100)
+        name_tokens = _match_tokens(reg['name'])
+        house_number = (reg['house_number'] or '').lower()
+        registrations_by_id[reg['id']] = (reg, name_tokens, house_number)
+        for token in name_tokens:
+            index[(amount_cents, token)].add(reg['id'])
+        if house_number:
+            index[(amount_cents, f'#{house_number}')].add(reg['id'])
+
+    stats = {'lines': 0, 'credits': 0, 'errors': 0}
+    candidates = []
+    credits = []
+    for transaction in transactions:
+        stats['lines'] += 1
+        if 'error' in transaction:
+            stats['errors'] += 1
+            continue
+        if transaction['amount_cents'] <= 0:
+            continue
+        position = len(credits)
+        credits.append(transaction)
+        text = f"{transaction['name']} {transaction['description']}"
+        tokens = _match_tokens(text)
+        reference = HOUSE_NUMBER_REFERENCE.search(text)
+        house_number = reference.group(1).lower() if reference else None
+
+        keys = [(transaction['amount_cents'], token) for token in tokens]
+        if house_number:
+            keys.append((transaction['amount_cents'], f'#{house_number}'))
+        matches = []
+        for reg_id in set().union(*(index.get(key, ()) for key in keys)):
+            reg, name_tokens, reg_house_number = registrations_by_id[reg_id]
+            if house_number and house_number != reg_house_number:
+                continue
+            name_score = len(name_tokens & tokens) / len(name_tokens) if name_tokens else 0.0
+            score = name_score + (2.0 if house_number else 0.0)
+            # A house number reference or the complete name is needed for a proposal
+            if score >= 1.0:
+                matches.append((score, position, reg_id, house_number is not None and name_score >= 0.5))
+        # Without a house number, namesakes with the same amount cannot be told apart
+        if house_number is None and sum(1 for match in matches if match[0] == 1.0) > 1:
+            continue
+        candidates.extend(matches)
+    stats['credits'] = len(credits)
+
+    proposals = []
+    used_positions, used_registrations = set(), set()
+    for score, position, reg_id, confident in sorted(candidates, key=lambda c: (-c[0], c[1])):
+        if position in used_positions or reg_id in used_registrations:
+            continue
+        used_positions.add(position)
+        used_registrations.add(reg_id)
+        proposals.append({
+            'transaction': credits[position],
+            'registration': registrations_by_id[reg_id][0],
+            'score': round(score, 2),
+            'confident': confident
+        })
+    proposals.sort(key=lambda p: p['transaction']['line'])
+    unmatched = [t for i, t in enumerate(credits) if i not in used_positions]
+    return proposals, unmatched, stats
+
+def build_payment_confirmation_email(reg):
+    """Subject and HTML body of the 'payment received' mail for a registration row"""
+    bbq_details = get_cached_bbq_details()
+    bbq_date = get_config_value('bbq_date', bbq_details["date"])
+    bbq_location = get_config_value('bbq_location', 'het buurthuis')
+    bbq_contact = get_config_value('bbq_contact_phone', '06-12345678')
+
+    subject = "Bevestiging betaling Buurt BBQ verwerkt"
+    body = f"""
+    <html>
+    <body>
+        <p>Beste {reg['name']} (Huisnummer {reg['house_number']}),</p>
+        <p>Goed nieuws! Uw betaling van <strong>€{reg['total_amount']:.2f}</strong> voor de Buurt BBQ is zojuist door de organisatie <strong>verwerkt en bevestigd</strong>.</p>
+        <p>U bent nu officieel aangemeld voor {reg['persons_adults']} volwassene(n) en {reg['persons_children']} kind(eren).</p>
+        <p>Wij kijken ernaar uit u te zien op ons tuinfeest op <strong>{bbq_date}</strong> bij <strong>{bbq_location}</strong>!</p>
+        <p>Voor vragen kunt u contact opnemen via {bbq_contact}.</p>
+        <p>Met vriendelijke groet,</p>
+        <p>Het organisatieteam</p>
+    </body>
+    </html>
+    """
+    return subject, body
+
+def mark_pending_paid(conn, reg_ids):
+    """Mark pending registrations as paid in the caller's transaction and return the updated rows (caller commits)"""
+    updated = []
+    for reg_id in reg_ids:
+        reg = conn.execute(
+            """SELECT id, name, house_number, email, persons_adults, persons_children, total_amount
+               FROM registrations WHERE id = ? AND payment_status = 'pending'""",
+            (reg_id,)
+        ).fetchone()
+        if reg is None:
+            continue
+        conn.execute(
+            "UPDATE registrations SET payment_status = 'paid', paid_amount = total_amount WHERE id = ?",
+            (reg_id,)
+        )
+        record_change(conn, 'registration_updated', {
+            'id': reg_id, 'payment_status': 'paid', 'paid_amount': reg['total_amount']
+        })
+        updated.append(reg)
+    return updated
+
+def mark_registrations_paid(reg_ids):
+    """Mark pending registrations as paid in one transaction and return the updated rows"""
+    with db_pool.get_connection() as conn:
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            updated = mark_pending_paid(conn, reg_ids)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return updated
+
+# Payment provider callbacks (bunq-style JSON). The webhook only verifies and stores the raw event in
+# payment_events; a processor thread per worker applies them in batches, the scheduler picks up leftovers
+PAYMENT_WEBHOOK_SECRET = os.getenv('PAYMENT_WEBHOOK_SECRET', '')  # HMAC-SHA256 key for X-Webhook-Signature
+PAYMENT_WEBHOOK_PUBLIC_KEY = os.getenv('PAYMENT_WEBHOOK_PUBLIC_KEY', '')  # PEM file with bunq's server public key
+PAYMENT_WEBHOOK_MAX_CONTENT_LENGTH = 64 * 1024
+PAYMENT_EVENT_BATCH_SIZE = int(os.getenv('PAYMENT_EVENT_BATCH_SIZE', 100))
+PAYMENT_EVENT_BATCH_DELAY = float(os.getenv('PAYMENT_EVENT_BATCH_DELAY', 0.5))  # seconds a burst may pile up
+PAYMENT_EVENT_INTERVAL = 60  # scheduler safety net for events a worker did not get to
+
+_webhook_public_key = None
+
+def payment_webhook_enabled():
+    """True when callbacks can be verified, so the webhook accepts them"""
+    return bool(PAYMENT_WEBHOOK_SECRET or (PAYMENT_WEBHOOK_PUBLIC_KEY and serialization))
+
+def verify_webhook_signature(body, headers):
+    """Check the HMAC signature (PAYMENT_WEBHOOK_SECRET) or bunq's RSA signature of the raw body"""
+    global _webhook_public_key
+    if PAYMENT_WEBHOOK_SECRET:
+        expected = 'sha256=' + hmac.new(PAYMENT_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(headers.get('X-Webhook-Signature', ''), expected)
+    signature = headers.get('X-Bunq-Server-Signature', '')
+    if not signature or not payment_webhook_enabled():
+        return False
+    if _webhook_public_key is None:
+        try:
+            with open(PAYMENT_WEBHOOK_PUBLIC_KEY, 'rb') as f:
+                _webhook_public_key = serialization.load_pem_public_key(f.read())
+        except (OSError, ValueError) as e:
+            logger.error(f"Publieke sleutel voor betalingsnotificaties kon niet worden geladen: {e}")
+            return False
+    try:
+        _webhook_public_key.verify(base64.b64decode(signature), body, padding.PKCS1v15(), hashes.SHA256())
+        return True
+    except (InvalidSignature, ValueError):
+        return False
+
+def payment_event_id(payload, body):
+    """Provider event ID (category, object type and object id), or a hash of the body when it has none"""
+    try:
+        notification = payload['NotificationUrl']
+        (object_type, obj), = notification['object'].items()
+        return f"{notification.get('category', '')}:{object_type}:{obj['id']}"
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return 'sha256:' + hashlib.sha256(body).hexdigest()
+
+def parse_payment_event(payload):
+    """Turn a bunq-style Payment callback into a transaction for match_bank_transactions, or None"""
+    try:
+        payment = payload['NotificationUrl']['object']['Payment']
+        if payment['amount'].get('currency', 'EUR') != 'EUR':
+            return None
+        return {
+            'date': str(payment.get('created', ''))[:10],
+            'amount_cents': parse_amount_cents(str(payment['amount']['value'])),
+            'name': (payment.get('counterparty_alias') or {}).get('display_name') or '',
+            'description': payment.get('description') or ''
+        }
+    except (KeyError, TypeError, AttributeError, ValueError):
+        return None
+
+def process_payment_events(limit=None):
+    """Apply pending payment events, one batch per transaction, and queue the confirmation mails.
+
+    Only confident matches (house number reference and name) are marked paid; the other
+    incoming payments stay 'unmatched' in the inbox for manual reconciliation.
+    """
+    limit = limit or PAYMENT_EVENT_BATCH_SIZE
+    counts = {'applied': 0, 'unmatched': 0, 'ignored': 0}
+    while True:
+        with db_pool.get_connection() as conn:
+            try:
+                # The write lock makes every batch belong to exactly one worker
+                conn.execute('BEGIN IMMEDIATE')
+                events = conn.execute(
+                    "SELECT id, payload FROM payment_events WHERE status = 'pending' ORDER BY id LIMIT ?",
+                    (limit,)
+                ).fetchall()
+                if not events:
+                    conn.rollback()
+                    break
+                outcomes = {}
+                transactions = []
+                for event in events:
+                    try:
+                        transaction = parse_payment_event(json.loads(event['payload']))
+                    except ValueError:
+                        transaction = None
+                    if transaction is None or transaction['amount_cents'] <= 0:
+                        outcomes[event['id']] = ('ignored', None)
+                        continue
+                    transaction['line'] = event['id']
+                    transactions.append(transaction)
+                    outcomes[event['id']] = ('unmatched', None)
+
+                paid = []
+                if transactions:
+                    amounts = sorted({transaction['amount_cents'] for transaction in transactions})
+                    pending = conn.execute(
+                        f"""SELECT id, name, house_number, email, total_amount FROM registrations
+                            WHERE payment_status = 'pending' AND round(total_amount * 100) IN ({','.join('?' * len(amounts))})""",
+                        amounts
+                    ).fetchall()
+                    proposals, _, _ = match_bank_transactions(transactions, pending)
+                    events_by_registration = {
+                        proposal['registration']['id']: proposal['transaction']['line']
+                        for proposal in proposals if proposal['confident']
+                    }
+                    paid = mark_pending_paid(conn, list(events_by_registration))
+                    for reg in paid:
+                        outcomes[events_by_registration[reg['id']]] = ('applied', reg['id'])
+
+                now = int(time.time())
+                conn.executemany(
+                    'UPDATE payment_events SET status = ?, registration_id = ?, processed_at = ? WHERE id = ?',
+                    [(status, reg_id, now, event_id) for event_id, (status, reg_id) in outcomes.items()]
+                )
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        send_emails([(reg['email'], *build_payment_confirmation_email(reg)) for reg in paid if reg['email']])
+        for status, _ in outcomes.values():
+            counts[status] += 1
+        if len(events) < limit:
+            break
+    if any(counts.values()):
+        logger.info(f"Betalingsnotificaties verwerkt: {counts['applied']} betaald, {counts['unmatched']} niet gekoppeld, {counts['ignored']} genegeerd")
+    return counts
+
+class PaymentEventProcessor:
+    def __init__(self):
+        self.wake = threading.Event()
+        self.worker_thread = None
+        self.lock = threading.Lock()
+
+    def notify(self):
+        """Have this worker's processor thread apply the stored events shortly"""
+        with self.lock:
+            if self.worker_thread is None or not self.worker_thread.is_alive():
+                self.worker_thread = threading.Thread(target=self._worker, daemon=True)
+                self.worker_thread.start()
+        self.wake.set()
+
+    def _worker(self):
+        while True:
+            self.wake.wait()
+            # Let a burst of callbacks pile up so it is applied in a few transactions
+            time.sleep(PAYMENT_EVENT_BATCH_DELAY)
+            self.wake.clear()
+            try:
+                process_payment_events()
+            except Exception as e:
+                logger.error(f"Fout bij verwerken betalingsnotificaties: {e}")
+
+payment_processor = PaymentEventProcessor()
+scheduler.add_job('payment-events', PAYMENT_EVENT_INTERVAL, process_payment_events, lease_seconds=300)
+
+if PAYMENT_WEBHOOK_PUBLIC_KEY and not PAYMENT_WEBHOOK_SECRET and serialization is None:
+    logger.warning("PAYMENT_WEBHOOK_PUBLIC_KEY is ingesteld maar het pakket cryptography ontbreekt; de betaalwebhook is uitgeschakeld.")
+
+
+@bp.cli.command('simulate-payment')
+@click.argument('reg_ids', nargs=-1, type=int, required=True)
+@click.option('--url', help='Webhook van een draaiende app, bv. http://localhost:3000/api/webhooks/payment (standaard intern).')
+def simulate_payment_command(reg_ids, url):
+    """Send signed bunq-style payment callbacks for registrations, as a local stand-in for the provider."""
+    if not PAYMENT_WEBHOOK_SECRET:
+        click.echo('Zet PAYMENT_WEBHOOK_SECRET om gesimuleerde betalingen te kunnen ondertekenen.')
+        raise SystemExit(1)
+    with db_pool.get_connection() as conn:
+        registrations = {
+            row['id']: row for row in conn.execute(
+                f"SELECT id, name, house_number, total_amount FROM registrations WHERE id IN ({','.join('?' * len(reg_ids))})",
+                reg_ids
+            )
+        }
+    client = None if url else current_app.test_client()
+    for reg_id in reg_ids:
+        reg = registrations.get(reg_id)
+        if reg is None:
+            click.echo(f"Aanmelding {reg_id}: niet gevonden.")
+            continue
+        body = json.dumps({'NotificationUrl': {
+            'category': 'PAYMENT',
+            'event_type': 'PAYMENT_RECEIVED',
+            'object': {'Payment': {
+                'id': secrets.randbelow(10 ** 9),
+                'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f'),
+                'amount': {'currency': 'EUR', 'value': f"{reg['total_amount']:.2f}"},
+                'description': f"BBQ {reg['name']} - Huisnr: {reg['house_number']}",
+                'counterparty_alias': {'display_name': reg['name']}
+            }}
+        }}).encode()
+        headers = {
+            'Content-Type': 'application/json',
+            'X-Webhook-Signature': 'sha256=' + hmac.new(PAYMENT_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+        }
+        if client:
+            status = client.post('/api/webhooks/payment', data=body, headers=headers).status_code
+        else:
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url, data=body, headers=headers), timeout=10) as response:
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+        click.echo(f"Aanmelding {reg_id}: €{reg['total_amount']:.2f} verstuurd, HTTP {status}")
+    if client:
+        # No server process to run the background processor, so apply them right away
+        click.echo(f"Verwerkt: {json.dumps(process_payment_events())}")
+
+# Organizer notifications: one e-mail per registration (immediate) or a periodic summary (digest)
+DIGEST_CHECK_INTERVAL = 60  # seconds between scheduler checks whether a digest is due
+
+def get_digest_settings():
+    """(mode, minutes, size) for organizer notifications, falling back to the defaults on bad values"""
+    mode = get_config_value('organizer_notification_mode', 'immediate')
+    try:
+        minutes = max(1, int(get_config_value('organizer_digest_minutes', '15')))
+    except ValueError:
+        minutes = 15
+    try:
+        size = max(1, int(get_config_value('organizer_digest_size', '25')))
+    except ValueError:
+        size = 25
+    return ('digest' if mode == 'digest' else 'immediate'), minutes, size
+
+def fetch_digest_registrations(conn, after_id):
+    """Registrations since the last digest, with the digest and overall totals, in one query"""
+    return conn.execute('''
+        SELECT r.id, r.name, r.house_number, r.email, r.persons_adults, r.persons_children,
+               r.allergies_notes, r.total_amount, r.registered_at,
+               (julianday('now') - julianday(r.registered_at)) * 1440 AS age_minutes,
+               COUNT(*) OVER () AS digest_count,
+               SUM(r.persons_adults) OVER () AS digest_adults,
+               SUM(COALESCE(r.persons_children, 0)) OVER () AS digest_children,
+               SUM(r.total_amount) OVER () AS digest_amount,
+               t.registration_count, t.total_adults, t.total_children, t.total_due_amount, t.total_paid_amount
+        FROM registrations r CROSS JOIN registration_totals t
+        WHERE r.id > ?
+        ORDER BY r.id
+    ''', (after_id,)).fetchall()
+
+def build_organizer_digest_email(rows):
+    """Subject and HTML body summarising the registrations of one digest"""
+    first = rows[0]
+    subject = f"BBQ AANMELDINGEN: {first['digest_count']} nieuw ({first['registration_count']} in totaal)"
+    table_rows = ''.join(
+        f"""
+                        <tr>
+                            <td>{html.escape(row['name'])}</td>
+                            <td>{html.escape(row['house_number'] or '')}</td>
+                            <td>{html.escape(row['email'] or '-')}</td>
+                            <td>{row['persons_adults']}</td>
+                            <td>{row['persons_children'] or 0}</td>
+                            <td>€{row['total_amount']:.2f}</td>
+                            <td>{html.escape(row['allergies_notes'] or '')}</td>
+                            <td>{row['registered_at']}</td>
+                        </tr>"""
+        for row in rows
+    )
+    body = f"""
+    <html>
+    <head>
+        <style>
+            table {{ width: 100%; border-collapse: collapse; }}
+            th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
+            th {{ background-color: #f2f2f2; }}
+            .highlight {{ background-color: #e6ffe6; font-weight: bold; }}
+        </style>
+    </head>
+    <body>
+        <p>Beste beheerder,</p>
+        <p>Sinds de vorige samenvatting zijn er <strong>{first['digest_count']} nieuwe aanmelding(en)</strong> voor de Buurt BBQ ontvangen.</p>
+
+        <table>
+            <tr>
+                <th>Naam</th>
+                <th>Huisnr.</th>
+                <th>E-mail</th>
+                <th>Volw.</th>
+                <th>Kind.</th>
+                <th>Bedrag</th>
+                <th>Allergieën/Opmerkingen</th>
+                <th>Aangemeld (UTC)</th>
+            </tr>{table_rows}
+            <tr class="highlight">
+                <td colspan="3">Nieuw in deze samenvatting</td>
+                <td>{first['digest_adults']}</td>
+                <td>{first['digest_children']}</td>
+                <td>€{first['digest_amount']:.2f}</td>
+                <td colspan="2"></td>
+            </tr>
+        </table>
+
+        <p>Stand nu: {first['registration_count']} aanmeldingen, {first['total_adults']} volwassenen en {first['total_children']} kinderen;
+           €{first['total_paid_amount']:.2f} van €{first['total_due_amount']:.2f} betaald.</p>
+        <p>Bekijk alle aanmeldingen in het BBQ Admin Paneel.</p>
+
+        <p>Met vriendelijke groet,</p>
+        <p>Je BBQ Aanmeld Applicatie</p>
+    </body>
+    </html>
+    """
+    return subject, body
+
+def send_organizer_digest(force=False):
+    """Send the organizer one summary of the registrations since the last digest, when it is due.
+
+    Due means organizer_digest_size new registrations, or the oldest unreported
+    one is organizer_digest_minutes old. The cursor moves in the same
+    transaction that reads the rows, so concurrent callers never report a
+    registration twice.
+    """
+    mode, minutes, size = get_digest_settings()
+    if mode != 'digest' and not force:
+        return {'sent': 0, 'reason': 'immediate'}
+    organizer_email = get_config('organizer_email', '')
+    with db_pool.get_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor_id = conn.execute('SELECT last_registration_id FROM organizer_digest WHERE id = 1').fetchone()[0]
+            rows = fetch_digest_registrations(conn, cursor_id)
+            if not rows:
+                conn.rollback()
+                return {'sent': 0, 'reason': 'empty'}
+            due = force or len(rows) >= size or rows[0]['age_minutes'] >= minutes
+            if not due:
+                conn.rollback()
+                return {'sent': 0, 'reason': 'waiting', 'pending': len(rows)}
+            conn.execute(
+                '''UPDATE organizer_digest
+                   SET last_registration_id = ?, last_sent_at = CURRENT_TIMESTAMP, digests_sent = digests_sent + 1
+                   WHERE id = 1''',
+                (rows[-1]['id'],)
+            )
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    if organizer_email:
+        subject, body = build_organizer_digest_email(rows)
+        send_email(organizer_email, subject, body)
+    logger.info(f"Samenvatting voor organisator met {len(rows)} aanmelding(en) verstuurd")
+    return {'sent': len(rows), 'last_registration_id': rows[-1]['id']}
+
+def maybe_send_organizer_digest(registration_id, size):
+    """Send the digest right away once size registrations are waiting, instead of at the next check"""
+    with db_pool.get_connection() as conn:
+        cursor_id = conn.execute('SELECT last_registration_id FROM organizer_digest WHERE id = 1').fetchone()[0]
+    # Ids are a cheap upper bound; send_organizer_digest() counts the real rows
+    if registration_id - cursor_id >= size:
+        send_organizer_digest()
+
+scheduler.add_job('organizer-digest', DIGEST_CHECK_INTERVAL, send_organizer_digest)
 
 # Decorator om routes te beveiligen
 def login_required(f):
@@ -602,7 +2873,7 @@ def login_required(f):
     def decorated_function(*args, **kwargs):
         if 'logged_in' not in session:
             flash('U moet inloggen om deze pagina te bekijken.', 'error')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -612,51 +2883,134 @@ def send_email(to_email, subject, body_html, is_html=True):
     email_queue.send_email_async(to_email, subject, body_html, is_html)
     return True  # Always return True since it's queued
 
-@app.route('/')
+def send_emails(messages):
+    """Queue a batch of (to_email, subject, body_html) messages at once"""
+    email_queue.send_emails_async(messages)
+
+@bp.route('/')
 def index():
     # Use cached BBQ details for better performance
-    return render_template('index.html', bbq_details=get_cached_bbq_details())
+    return render_conditional('index.html', bbq_details=get_cached_bbq_details())
+
+@bp.route('/sw.js')
+def service_worker():
+    """Service worker for the public pages; served from the root so its scope covers them"""
+    precache = [
+        url_for('main.index'),
+        url_for('main.success_page'),
+        url_for('static', filename='style.css'),
+        url_for('static', filename='script.js'),
+        url_for('static', filename='favicon.png')
+    ]
+    # The hero image is configurable, so it is precached best-effort: a missing file must not break the install
+    optional = []
+    hero_image = get_config_value('hero_image')
+    if hero_image and os.path.isfile(os.path.join(current_app.static_folder, hero_image)):
+        optional.append(url_for('static', filename=hero_image))
+    # A new asset version changes the script, which makes browsers install the new worker
+    version = hashlib.sha1(json.dumps(precache + optional).encode()).hexdigest()[:10]
+    body = render_template('sw.js', precache=precache, optional_precache=optional, version=version)
+    response = Response(body, mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(hashlib.sha1(body.encode()).hexdigest()[:16])
+    return response.make_conditional(request)
+
+@bp.route('/api/availability', methods=['GET'])
+def availability_api():
+    """Public registration figures for the landing page; poll with If-None-Match"""
+    try:
+        body, etag = availability_cache.get()
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Fout bij ophalen beschikbaarheid: {e}")
+        return jsonify({'message': 'Beschikbaarheid is tijdelijk niet bekend.'}), 503
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = (
+        f'public, max-age={int(AVAILABILITY_CACHE_TTL)}, stale-while-revalidate={AVAILABILITY_STALE_SECONDS}'
+    )
+    return response.make_conditional(request)
 
-@app.route('/success')
+@bp.route('/success')
 def success_page():
-    return render_template('success.html')
+    return render_conditional('success.html')
 
 # Login pagina
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username'].strip()
         password = request.form['password']
 
+        # Throttle per client IP and per username before any password hashing
+        allowed, retry_after = check_rate_limit('login_ip', request.remote_addr)
+        if allowed:
+            allowed, retry_after = check_rate_limit('login_user', username.lower())
+        if not allowed:
+            flash(f'Te veel inlogpogingen. Probeer het over {retry_after} seconden opnieuw.', 'error')
+            return render_template('login.html'), 429, {'Retry-After': str(retry_after)}
+
         with db_pool.get_connection() as conn:
-            # Case-insensitive username lookup
-            user = conn.execute('SELECT * FROM users WHERE LOWER(username) = LOWER(?)', (username,)).fetchone()
+            # Case-insensitive, indexed lookup; deactivated admins cannot log in
+            user = get_active_user(conn, username)
 
         if user and check_password_hash(user['password_hash'], password):
+            if password_needs_rehash(user['password_hash']):
+                with db_pool.get_connection() as conn:
+                    conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (hash_password(password), user['id']))
+                    conn.commit()
+                logger.info(f"Wachtwoord-hash van {user['username']} bijgewerkt naar {PASSWORD_HASH_METHOD}")
             session['logged_in'] = True
             flash('Succesvol ingelogd!', 'success')
-            return redirect(url_for('admin_dashboard'))
+            return redirect(url_for('main.admin_dashboard'))
         else:
             flash('Ongeldige gebruikersnaam of wachtwoord.', 'error')
     return render_template('login.html')
 
 # Logout functie
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.pop('logged_in', None)
     flash('U bent uitgelogd.', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 # Configuration management routes
-@app.route('/admin/config')
+@bp.route('/admin/config')
 @login_required
 def admin_config():
     """Admin configuration page"""
     configs = get_all_config()
+    # Flat snapshot of the same rows, so the template does no further config lookups
+    config_values = {
+        setting['key']: setting['value']
+        for category_settings in configs.values()
+        for setting in category_settings
+    }
     admins = get_all_admins()
-    return render_template('admin_config.html', configs=configs, admins=admins)
+    return render_template(
+        'admin_config.html', configs=configs, config_values=config_values, admins=admins,
+        backups=list_backups(), backup_status=get_job_status('backup'),
+        backup_dir=BACKUP_DIR, backup_interval_hours=BACKUP_INTERVAL_HOURS, backup_retention=BACKUP_RETENTION,
+        database_metrics=get_database_metrics()
+    )
 
-@app.route('/admin/config/update', methods=['POST'])
+@bp.route('/admin/backup', methods=['POST'])
+@login_required
+def backup_now():
+    """Write a database backup right away"""
+    try:
+        status, detail = run_job('backup', create_backup, force=True)
+    except sqlite3.Error as e:
+        logger.error(f"Fout bij starten back-up: {e}")
+        status, detail = 'error', str(e)
+    if status is None:
+        flash('Er loopt al een back-up, probeer het zo opnieuw.', 'info')
+    elif status == 'ok':
+        flash(f"Back-up gemaakt: {detail['file']} ({detail['size'] / 1024:.0f} kB).", 'success')
+    else:
+        flash(f"Back-up mislukt: {detail}", 'error')
+    return redirect(url_for('main.admin_config') + '#backups')
+
+@bp.route('/admin/config/update', methods=['POST'])
 @login_required
 def update_config():
     """Update configuration settings"""
@@ -674,12 +3028,9 @@ def update_config():
         }
 
         # Create a mapping from config key to its category for efficient lookup
-        all_configs = get_all_config()
-        key_to_category_map = {
-            setting['key']: setting['category']
-            for category_settings in all_configs.values()
-            for setting in category_settings
-        }
+        key_to_category_map = get_config_categories()
+        # All changed values are written together in one transaction at the end
+        updates = {}
 
         # Handle file upload for the 'content' tab
         if active_tab == 'content' and 'hero_image' in request.files:
@@ -690,8 +3041,7 @@ def update_config():
                 filename = f"{timestamp}_{filename}"
                 filepath = os.path.join(UPLOAD_FOLDER, filename)
                 file.save(filepath)
-                # Use set_config to preserve description and category for new uploads
-                set_config('hero_image', f'uploads/{filename}', description='Hero afbeelding', category='content')
+                updates['hero_image'] = f'uploads/{filename}'
                 flash('Hero afbeelding succesvol geüpload!', 'success')
 
         # Process and save only the form fields relevant to the active tab
@@ -700,13 +3050,27 @@ def update_config():
             if key.startswith('config_'):
                 config_key = key[7:]  # Remove 'config_' prefix
                 if key_to_category_map.get(config_key) in categories_to_update:
-                    update_config_value(config_key, value)
+                    updates[config_key] = value
         
         # Special handling for checkboxes that might not be present when unchecked
         if active_tab == 'content':
             # Handle not_planned_mode checkbox - if not present, set to '0'
             if 'config_not_planned_mode' not in request.form:
-                update_config_value('not_planned_mode', '0')
+                updates['not_planned_mode'] = '0'
+        elif active_tab == 'variables':
+            if 'config_duplicate_check' not in request.form:
+                updates['duplicate_check'] = '0'
+
+        previous_mode = get_config_value('organizer_notification_mode', 'immediate')
+        update_config_values(updates)
+        if previous_mode == 'digest' and updates.get('organizer_notification_mode', previous_mode) != 'digest':
+            # Immediate mode moves the cursor past them, so send what was waiting for a digest now
+            try:
+                result = send_organizer_digest(force=True)
+                if result['sent']:
+                    flash(f"Samenvatting met {result['sent']} wachtende aanmelding(en) verstuurd.", 'info')
+            except sqlite3.Error as e:
+                logger.error(f"Fout bij versturen laatste samenvatting organisator: {e}")
         
         flash('Configuratie succesvol bijgewerkt!', 'success')
     except Exception as e:
@@ -714,10 +3078,10 @@ def update_config():
         flash('Fout bij bijwerken configuratie.', 'error')
         active_tab = 'variables' # Fallback to default tab on error
     
-    return redirect(url_for('admin_config') + f'#{active_tab}')
+    return redirect(url_for('main.admin_config') + f'#{active_tab}')
 
 
-@app.route('/admin/config/reset-style', methods=['POST'])
+@bp.route('/admin/config/reset-style', methods=['POST'])
 @login_required
 def reset_style_config():
     """Reset only style-related configuration to default values"""
@@ -737,16 +3101,17 @@ def reset_style_config():
                     VALUES (?, ?, ?, ?, ?)
                 """, (key, value, f'Default style value for {key}', 'appearance', datetime.now()))
             conn.commit()
+        config_cache.invalidate()
         
         flash('Stijl instellingen succesvol gereset naar standaardwaarden!', 'success')
     except Exception as e:
         logger.error(f"Error resetting style config: {e}")
         flash('Fout bij resetten stijl instellingen.', 'error')
     
-    return redirect(url_for('admin_config'))
+    return redirect(url_for('main.admin_config'))
 
 # Admin user management routes
-@app.route('/admin/users/create', methods=['POST'])
+@bp.route('/admin/users/create', methods=['POST'])
 @login_required
 def create_admin_user():
     """Create new admin user"""
@@ -756,13 +3121,13 @@ def create_admin_user():
     
     if not username or not password:
         flash('Gebruikersnaam en wachtwoord zijn verplicht.', 'error')
-        return redirect(url_for('admin_config') + '#users')
+        return redirect(url_for('main.admin_config') + '#users')
     
     success, message = create_admin(username, password, email)
     flash(message, 'success' if success else 'error')
-    return redirect(url_for('admin_config') + '#users')
+    return redirect(url_for('main.admin_config') + '#users')
 
-@app.route('/admin/users/update_password/<int:admin_id>', methods=['POST'])
+@bp.route('/admin/users/update_password/<int:admin_id>', methods=['POST'])
 @login_required
 def update_admin_user_password(admin_id):
     """Update admin user password"""
@@ -770,25 +3135,51 @@ def update_admin_user_password(admin_id):
     
     if not new_password:
         flash('Nieuw wachtwoord is verplicht.', 'error')
-        return redirect(url_for('admin_config') + '#users')
+        return redirect(url_for('main.admin_config') + '#users')
     
     success, message = update_admin_password(admin_id, new_password)
     flash(message, 'success' if success else 'error')
-    return redirect(url_for('admin_config') + '#users')
+    return redirect(url_for('main.admin_config') + '#users')
 
-@app.route('/admin/users/delete/<int:admin_id>', methods=['POST'])
+@bp.route('/admin/users/delete/<int:admin_id>', methods=['POST'])
 @login_required
 def delete_admin_user(admin_id):
     """Delete admin user"""
     success, message = delete_admin(admin_id)
     flash(message, 'success' if success else 'error')
-    return redirect(url_for('admin_config') + '#users')
+    return redirect(url_for('main.admin_config') + '#users')
 
 
-@app.route('/api/register', methods=['POST'])
+@bp.route('/api/register', methods=['POST'])
 @csrf.exempt
 def register_and_pay():
-    data = request.json
+    # Much tighter than the global upload limit; also caps chunked bodies without a Content-Length
+    request.max_content_length = REGISTER_MAX_CONTENT_LENGTH
+    if request.content_length is not None and request.content_length > REGISTER_MAX_CONTENT_LENGTH:
+        return jsonify({'message': 'Aanmelding is te groot.'}), 413
+
+    # Retries of an earlier request get the original response, without spending a rate limit token
+    idempotency_key = request.headers.get('Idempotency-Key', '').strip()
+    if idempotency_key:
+        if not IDEMPOTENCY_KEY_PATTERN.match(idempotency_key):
+            return jsonify({'message': 'Ongeldige Idempotency-Key header.'}), 400
+        with db_pool.get_connection() as conn:
+            stored = get_idempotent_response(conn, idempotency_key)
+        if stored:
+            logger.info(f"Aanmelding herhaald met Idempotency-Key {idempotency_key}, oorspronkelijke response teruggegeven")
+            return replay_idempotent_response(stored)
+
+    # Checked before the body is even parsed
+    allowed, retry_after = check_rate_limit('register_ip', request.remote_addr)
+    if not allowed:
+        return jsonify({
+            'message': f'Te veel aanmeldingen vanaf dit adres. Probeer het over {retry_after} seconden opnieuw.'
+        }), 429, {'Retry-After': str(retry_after)}
+
+    try:
+        data = request.get_json()
+    except RequestEntityTooLarge:
+        return jsonify({'message': 'Aanmelding is te groot.'}), 413
     
     # Validate input data
     validation_errors = validate_registration_data(data)
@@ -812,6 +3203,7 @@ def register_and_pay():
     payment_method = get_config_value('payment_method', 'none')
     bunq_me_link = get_config_value('bunq_me_link', '')
     no_payment_message = get_config_value('no_payment_message', 'Uw aanmelding is succesvol ontvangen! Wij nemen binnenkort contact met u op voor de betaling.')
+    notification_mode, _, digest_size = get_digest_settings()
 
     payment_url = ""
     payment_status = "pending"
@@ -827,6 +3219,23 @@ def register_and_pay():
 
         with db_pool.get_connection() as conn:
             try:
+                # Take the write lock first so a concurrent retry cannot slip between the checks and the insert
+                conn.execute('BEGIN IMMEDIATE')
+                if idempotency_key:
+                    stored = get_idempotent_response(conn, idempotency_key)
+                    if stored:
+                        conn.rollback()
+                        return replay_idempotent_response(stored)
+                if email and get_config_value('duplicate_check', '1') == '1' and not data.get('confirmDuplicate'):
+                    duplicate_id = find_duplicate_registration(conn, house_number, email)
+                    if duplicate_id:
+                        conn.rollback()
+                        logger.info(f"Mogelijke dubbele aanmelding voor huisnummer {house_number} (bestaande ID: {duplicate_id})")
+                        return jsonify({
+                            'message': 'Er bestaat al een aanmelding voor dit huisnummer en e-mailadres.',
+                            'duplicate': True
+                        }), 409
+
                 cursor = conn.cursor()
                 cursor.execute(
                     '''INSERT INTO registrations (name, house_number, email, persons_adults, persons_children, allergies_notes, total_amount, bunq_me_url, payment_status, paid_amount) 
@@ -834,6 +3243,32 @@ def register_and_pay():
                     (name, house_number, email, persons_adults, persons_children, allergies_notes, total_amount, payment_url, payment_status, 0.0)
                 )
                 registration_id = cursor.lastrowid
+                record_change(conn, 'registration_created', {
+                    'id': registration_id, 'name': name, 'house_number': house_number,
+                    'persons_adults': persons_adults, 'persons_children': persons_children,
+                    'allergies_notes': allergies_notes, 'total_amount': total_amount,
+                    'paid_amount': 0.0, 'payment_status': payment_status
+                })
+
+                # Different response based on payment method
+                if payment_method == 'bunq' and payment_url:
+                    response_data = {
+                        'message': 'Aanmelding succesvol! Je wordt nu doorgestuurd naar de betaalpagina.',
+                        'paymentUrl': payment_url,
+                        'registrationId': registration_id,
+                        'paymentMethod': 'bunq'
+                    }
+                else:
+                    response_data = {
+                        'message': no_payment_message,
+                        'registrationId': registration_id,
+                        'paymentMethod': 'none'
+                    }
+                if idempotency_key:
+                    store_idempotent_response(conn, idempotency_key, 200, current_app.json.dumps(response_data))
+                if notification_mode == 'immediate':
+                    # Reported below; keeps a later switch to digest mode from repeating it
+                    conn.execute('UPDATE organizer_digest SET last_registration_id = ? WHERE id = 1', (registration_id,))
                 conn.commit()
                 logger.info(f"Aanmelding opgeslagen met ID: {registration_id} voor {name} (Huisnummer {house_number})")
                 flash('Aanmelding succesvol opgeslagen.', 'success')
@@ -877,109 +3312,103 @@ def register_and_pay():
                         flash(f'Fout bij versturen bevestigingsmail naar {email}.', 'error')
 
                 # E-mail naar de organisator met tabeloverzicht
-                subject_organizer = f"NIEUWE BBQ AANMELDING: {name} (Huisnummer {house_number})"
-                
-                # Different organizer email content based on payment method
-                if payment_method == 'bunq' and payment_url:
-                    payment_status_text = "Pending (via Bunq.me)"
-                    payment_link_text = f"<a href='{payment_url}'>{payment_url}</a>"
-                    payment_instructions = "<p>Controleer de betaling handmatig in je Bunq app en werk de status bij in het admin-paneel.</p>"
+                if notification_mode == 'digest':
+                    # Collected into one summary e-mail (send_organizer_digest)
+                    try:
+                        maybe_send_organizer_digest(registration_id, digest_size)
+                    except sqlite3.Error as e:
+                        logger.error(f"Fout bij versturen samenvatting organisator: {e}")
                 else:
-                    payment_status_text = "Geen betalingsintegratie"
-                    payment_link_text = "N.V.T."
-                    payment_instructions = "<p>Neem contact op met de deelnemer voor de betaling.</p>"
+                    subject_organizer = f"NIEUWE BBQ AANMELDING: {name} (Huisnummer {house_number})"
                 
-                body_organizer = f"""
-                <html>
-                <head>
-                    <style>
-                        table {{ width: 100%; border-collapse: collapse; }}
-                        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                        th {{ background-color: #f2f2f2; }}
-                        .highlight {{ background-color: #e6ffe6; font-weight: bold; }}
-                    </style>
-                </head>
-                <body>
-                    <p>Beste beheerder,</p>
-                    <p>Er is een <strong>nieuwe aanmelding</strong> voor de Buurt BBQ ontvangen via het online formulier.</p>
+                    # Different organizer email content based on payment method
+                    if payment_method == 'bunq' and payment_url:
+                        payment_status_text = "Pending (via Bunq.me)"
+                        payment_link_text = f"<a href='{payment_url}'>{payment_url}</a>"
+                        payment_instructions = "<p>Controleer de betaling handmatig in je Bunq app en werk de status bij in het admin-paneel.</p>"
+                    else:
+                        payment_status_text = "Geen betalingsintegratie"
+                        payment_link_text = "N.V.T."
+                        payment_instructions = "<p>Neem contact op met de deelnemer voor de betaling.</p>"
+                
+                    body_organizer = f"""
+                    <html>
+                    <head>
+                        <style>
+                            table {{ width: 100%; border-collapse: collapse; }}
+                            th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
+                            th {{ background-color: #f2f2f2; }}
+                            .highlight {{ background-color: #e6ffe6; font-weight: bold; }}
+                        </style>
+                    </head>
+                    <body>
+                        <p>Beste beheerder,</p>
+                        <p>Er is een <strong>nieuwe aanmelding</strong> voor de Buurt BBQ ontvangen via het online formulier.</p>
                     
-                    <table>
-                        <tr>
-                            <th>Details</th>
-                            <th>Waarde</th>
-                        </tr>
-                        <tr>
-                            <td><strong>Naam:</strong></td>
-                            <td>{name}</td>
-                        </tr>
-                        <tr>
-                            <td><strong>Adres:</strong></td>
-                            <td>Huisnummer {house_number}</td>
-                        </tr>
-                        <tr>
-                            <td><strong>E-mail:</strong></td>
-                            <td>{email if email else 'N.V.T. (niet opgegeven)'}</td>
-                        </tr>
-                        <tr>
-                            <td><strong>Aantal volwassenen:</strong></td>
-                            <td>{persons_adults}</td>
-                        </tr>
-                        <tr>
-                            <td><strong>Aantal kinderen:</strong></td>
-                            <td>{persons_children}</td>
-                        </tr>
-                        <tr>
-                            <td><strong>Allergieën/Opmerkingen:</strong></td>
-                            <td>{allergies_notes if allergies_notes else 'Geen specifieke opmerkingen'}</td>
-                        </tr>
-                        <tr class="highlight">
-                            <td><strong>Totaal verschuldigd:</strong></td>
-                            <td>€{total_amount:.2f}</td>
-                        </tr>
-                        <tr>
-                            <td><strong>Betalingsstatus:</strong></td>
-                            <td>{payment_status_text}</td>
-                        </tr>
-                        <tr>
-                            <td><strong>Betaallink:</strong></td>
-                            <td>{payment_link_text}</td>
-                        </tr>
-                        <tr>
-                            <td><strong>Datum aanmelding:</strong></td>
-                            <td>{datetime.now().strftime('%d-%m-%Y %H:%M:%S')}</td>
-                        </tr>
-                        <tr>
-                            <td><strong>Interne Registratie ID:</strong></td>
-                            <td>{registration_id}</td>
-                        </tr>
-                    </table>
+                        <table>
+                            <tr>
+                                <th>Details</th>
+                                <th>Waarde</th>
+                            </tr>
+                            <tr>
+                                <td><strong>Naam:</strong></td>
+                                <td>{name}</td>
+                            </tr>
+                            <tr>
+                                <td><strong>Adres:</strong></td>
+                                <td>Huisnummer {house_number}</td>
+                            </tr>
+                            <tr>
+                                <td><strong>E-mail:</strong></td>
+                                <td>{email if email else 'N.V.T. (niet opgegeven)'}</td>
+                            </tr>
+                            <tr>
+                                <td><strong>Aantal volwassenen:</strong></td>
+                                <td>{persons_adults}</td>
+                            </tr>
+                            <tr>
+                                <td><strong>Aantal kinderen:</strong></td>
+                                <td>{persons_children}</td>
+                            </tr>
+                            <tr>
+                                <td><strong>Allergieën/Opmerkingen:</strong></td>
+                                <td>{allergies_notes if allergies_notes else 'Geen specifieke opmerkingen'}</td>
+                            </tr>
+                            <tr class="highlight">
+                                <td><strong>Totaal verschuldigd:</strong></td>
+                                <td>€{total_amount:.2f}</td>
+                            </tr>
+                            <tr>
+                                <td><strong>Betalingsstatus:</strong></td>
+                                <td>{payment_status_text}</td>
+                            </tr>
+                            <tr>
+                                <td><strong>Betaallink:</strong></td>
+                                <td>{payment_link_text}</td>
+                            </tr>
+                            <tr>
+                                <td><strong>Datum aanmelding:</strong></td>
+                                <td>{datetime.now().strftime('%d-%m-%Y %H:%M:%S')}</td>
+                            </tr>
+                            <tr>
+                                <td><strong>Interne Registratie ID:</strong></td>
+                                <td>{registration_id}</td>
+                            </tr>
+                        </table>
                     
-                    {payment_instructions}
-                    <p><a href="{request.url_root}admin">Ga naar het BBQ Admin Paneel</a></p>
+                        {payment_instructions}
+                        <p><a href="{request.url_root}admin">Ga naar het BBQ Admin Paneel</a></p>
                     
-                    <p>Met vriendelijke groet,</p>
-                    <p>Je BBQ Aanmeld Applicatie</p>
-                </body>
-                </html>
-                """
-                organizer_email = get_config('organizer_email', '')
-                if organizer_email and not send_email(organizer_email, subject_organizer, body_organizer):
-                    flash(f'Fout bij versturen notificatiemail naar {organizer_email}.', 'error')
-
-                # Return different response based on payment method
-                if payment_method == 'bunq' and payment_url:
-                    return jsonify({
-                        'message': 'Aanmelding succesvol! Je wordt nu doorgestuurd naar de betaalpagina.',
-                        'paymentUrl': payment_url,
-                        'registrationId': registration_id,
-                        'paymentMethod': 'bunq'
-                    })
-                else:
-                    return jsonify({
-                        'message': no_payment_message,
-                        'registrationId': registration_id,
-                        'paymentMethod': 'none'
-                    })
+                        <p>Met vriendelijke groet,</p>
+                        <p>Je BBQ Aanmeld Applicatie</p>
+                    </body>
+                    </html>
+                    """
+                    organizer_email = get_config('organizer_email', '')
+                    if organizer_email and not send_email(organizer_email, subject_organizer, body_organizer):
+                        flash(f'Fout bij versturen notificatiemail naar {organizer_email}.', 'error')
+
+                return jsonify(response_data)
 
             except sqlite3.Error as e:
                 conn.rollback()
@@ -993,15 +3422,12 @@ def register_and_pay():
         return jsonify({'message': f'Er is een onverwachte fout opgetreden: {e}'}), 500
 
 # Beveilig de admin_dashboard route met @login_required
-@app.route('/admin')
+@bp.route('/admin')
 @login_required
 def admin_dashboard():
     registrations = []
-    total_persons = 0
-    total_adults = 0
-    total_children = 0
-    total_due_amount = 0.0
-    total_paid_amount = 0.0
+    totals = dict.fromkeys(TOTALS_COLUMNS, 0)
+    last_change_id = 0
     
     # Use cached BBQ details for better performance
     bbq_details = get_cached_bbq_details()
@@ -1009,13 +3435,10 @@ def admin_dashboard():
     with db_pool.get_connection() as conn:
         try:
             registrations = conn.execute('SELECT * FROM registrations ORDER BY registered_at DESC').fetchall()
-            
-            for reg in registrations:
-                total_adults += reg['persons_adults']
-                total_children += reg['persons_children']
-                total_persons = total_adults + total_children
-                total_due_amount += reg['total_amount']
-                total_paid_amount += reg['paid_amount']
+            # Totals come from the trigger-maintained summary row instead of a Python loop
+            totals = get_registration_totals(conn)
+            # Live updates resume from here so nothing between render and connect is missed
+            last_change_id = get_last_change_id(conn)
 
         except sqlite3.Error as e:
             flash(f"Fout bij ophalen aanmeldingen: {e}", 'error')
@@ -1024,18 +3447,162 @@ def admin_dashboard():
     return render_template(
         'admin.html', 
         registrations=registrations,
-        total_persons=total_persons,
-        total_adults=total_adults,
-        total_children=total_children,
-        total_due_amount=total_due_amount,
-        total_paid_amount=total_paid_amount,
-        bbq_details=bbq_details
+        total_persons=totals['total_adults'] + totals['total_children'],
+        total_adults=totals['total_adults'],
+        total_children=totals['total_children'],
+        total_due_amount=totals['total_due_amount'],
+        total_paid_amount=totals['total_paid_amount'],
+        bbq_details=bbq_details,
+        last_change_id=last_change_id
     )
 
+@bp.route('/admin/events')
+@login_required
+def admin_events():
+    """Stream registration changes and totals to the dashboard as Server-Sent Events"""
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0))
+    except ValueError:
+        last_id = 0
+
+    def generate(last_id):
+        # Streams only while this worker has a free slot; other clients get the pending changes and a
+        # longer retry: hint, so EventSource polls with Last-Event-ID instead of holding a thread
+        streaming = sse_stream_slots.acquire(blocking=False)
+        try:
+            retry = SSE_POLL_INTERVAL if streaming else SSE_POLL_FALLBACK_SECONDS
+            yield f"retry: {int(retry * 1000)}\n\n"
+            started = last_write = time.monotonic()
+            while True:
+                try:
+                    events, totals, gap = fetch_changes(last_id)
+                except sqlite3.Error as e:
+                    logger.error(f"Fout bij ophalen wijzigingen voor live updates: {e}")
+                    return
+                if gap:
+                    yield _format_sse('{}', event='reset')
+                    return
+                for event_id, event_type, payload in events:
+                    last_id = event_id
+                    yield _format_sse(payload, event=event_type, event_id=event_id)
+                if totals is not None:
+                    yield _format_sse(json.dumps(totals, separators=(',', ':')), event='totals')
+                    last_write = time.monotonic()
+                # Short-lived even when streaming: EventSource reconnects with Last-Event-ID
+                if not streaming or time.monotonic() - started >= SSE_STREAM_SECONDS:
+                    return
+                if time.monotonic() - last_write >= SSE_HEARTBEAT_INTERVAL:
+                    yield ': keepalive\n\n'
+                    last_write = time.monotonic()
+                time.sleep(SSE_POLL_INTERVAL)
+        finally:
+            if streaming:
+                sse_stream_slots.release()
+
+    return Response(generate(last_id), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@bp.route('/admin/catering')
+@login_required
+def catering_report():
+    """Headcounts and dietary requirements for ordering the food"""
+    try:
+        report = get_catering_report()
+    except sqlite3.Error as e:
+        logger.error(f"Fout bij opstellen cateringoverzicht: {e}")
+        flash(f"Fout bij opstellen cateringoverzicht: {e}", 'error')
+        return redirect(url_for('main.admin_dashboard'))
+    return render_template('admin_catering.html', report=report)
+
+@bp.route('/api/admin/catering', methods=['GET'])
+@login_required
+def catering_report_api():
+    try:
+        return jsonify(get_catering_report()), 200
+    except sqlite3.Error as e:
+        logger.error(f"Fout bij opstellen cateringoverzicht: {e}")
+        return jsonify({'message': 'Fout bij opstellen cateringoverzicht.'}), 500
+
+@bp.route('/api/admin/analytics', methods=['GET'])
+@login_required
+def registration_analytics_api():
+    """Sign-up velocity series for the dashboard chart"""
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in ANALYTICS_BUCKETS:
+        return jsonify({'message': 'Ongeldige periode, kies hour of day.'}), 400
+    days = request.args.get('days', type=int)
+    if days is not None and not 1 <= days <= 3650:
+        return jsonify({'message': 'Ongeldig aantal dagen.'}), 400
+    try:
+        return jsonify(get_registration_analytics(bucket, days)), 200
+    except sqlite3.Error as e:
+        logger.error(f"Fout bij berekenen statistieken: {e}")
+        return jsonify({'message': 'Fout bij berekenen statistieken.'}), 500
+
+@bp.route('/api/admin/metrics', methods=['GET'])
+@login_required
+def database_metrics_api():
+    """Database size and the last run of each background job (backup, maintenance)"""
+    try:
+        return jsonify(get_database_metrics()), 200
+    except sqlite3.Error as e:
+        logger.error(f"Fout bij ophalen databasestatistieken: {e}")
+        return jsonify({'message': 'Fout bij ophalen databasestatistieken.'}), 500
+
+CATERING_EXPORT_COLUMNS = {
+    'statuses': ('payment_status', 'registrations', 'adults', 'children', 'due_amount', 'paid_amount'),
+    'tags': ('tag', 'registrations', 'persons'),
+    'notes': ('name', 'house_number', 'persons_adults', 'persons_children', 'payment_status', 'tags', 'allergies_notes')
+}
+
+@bp.route('/admin/catering/export/<section>.csv')
+@login_required
+def export_catering_report(section):
+    """Download one section of the catering report as CSV (semicolon separated for Excel)"""
+    columns = CATERING_EXPORT_COLUMNS.get(section)
+    if columns is None:
+        return jsonify({'message': 'Onbekend onderdeel.'}), 404
+    try:
+        rows = get_catering_report()[section]
+    except sqlite3.Error as e:
+        logger.error(f"Fout bij exporteren cateringoverzicht: {e}")
+        flash(f"Fout bij exporteren cateringoverzicht: {e}", 'error')
+        return redirect(url_for('main.catering_report'))
+
+    output = io.StringIO()
+    output.write('\ufeff')
+    writer = csv.DictWriter(output, fieldnames=columns, delimiter=';', extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rows)
+    return Response(output.getvalue(), mimetype='text/csv', headers={
+        'Content-Disposition': f'attachment; filename=catering_{section}.csv'
+    })
+
+@bp.route('/api/admin/search', methods=['GET'])
+@login_required
+def search_registrations_api():
+    """Search-as-you-type lookup for the dashboard"""
+    text = request.args.get('q', '').strip()[:100]
+    with db_pool.get_connection() as conn:
+        try:
+            # One extra row tells whether the limit cut off matches
+            rows = search_registrations(conn, text, SEARCH_RESULT_LIMIT + 1)
+        except sqlite3.Error as e:
+            logger.error(f"Fout bij zoeken in aanmeldingen: {e}")
+            return jsonify({'message': 'Fout bij zoeken.'}), 500
+    truncated = len(rows) > SEARCH_RESULT_LIMIT
+    return jsonify({
+        'query': text,
+        'results': [dict(row) for row in rows[:SEARCH_RESULT_LIMIT]],
+        'truncated': truncated
+    }), 200
+
 # De route /admin/update_settings is verwijderd
 
 # Beveilig de API route voor details (optioneel, maar aanbevolen)
-@app.route('/api/registration/<int:reg_id>', methods=['GET'])
+@bp.route('/api/registration/<int:reg_id>', methods=['GET'])
 @login_required
 def get_registration_details(reg_id):
     with db_pool.get_connection() as conn:
@@ -1050,7 +3617,7 @@ def get_registration_details(reg_id):
             return jsonify({'message': 'Fout bij ophalen details.'}), 500
 
 # Beveilig de admin acties (add, update, delete)
-@app.route('/admin/add_registration', methods=['POST'])
+@bp.route('/admin/add_registration', methods=['POST'])
 @login_required
 def add_registration():
     name = request.form['name']
@@ -1069,11 +3636,17 @@ def add_registration():
 
     with db_pool.get_connection() as conn:
         try:
-            conn.execute(
+            cursor = conn.execute(
                 '''INSERT INTO registrations (name, house_number, email, persons_adults, persons_children, allergies_notes, total_amount, bunq_me_url, payment_status, paid_amount) 
                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
                 (name, house_number, email, persons_adults, persons_children, allergies_notes, total_amount, bunq_me_url, payment_status, initial_paid_amount)
             )
+            record_change(conn, 'registration_created', {
+                'id': cursor.lastrowid, 'name': name, 'house_number': house_number,
+                'persons_adults': persons_adults, 'persons_children': persons_children,
+                'allergies_notes': allergies_notes, 'total_amount': total_amount,
+                'paid_amount': initial_paid_amount, 'payment_status': payment_status
+            })
             conn.commit()
             flash("Aanmelding succesvol toegevoegd.", 'success')
         except sqlite3.Error as e:
@@ -1081,78 +3654,62 @@ def add_registration():
             flash(f"Fout bij toevoegen aanmelding: {e}", 'error')
             logger.error(f"Fout bij toevoegen aanmelding: {e}")
 
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('main.admin_dashboard'))
 
-@app.route('/admin/update_status/<int:reg_id>', methods=['POST'])
+@bp.route('/admin/update_status/<int:reg_id>', methods=['POST'])
 @login_required
 def update_registration_status(reg_id):
     new_status = request.form['status']
     
     with db_pool.get_connection() as conn:
         try:
-            current_reg = conn.execute('SELECT * FROM registrations WHERE id = ?', (reg_id,)).fetchone()
-            if not current_reg:
-                flash("Aanmelding niet gevonden.", 'info')
-                return redirect(url_for('admin_dashboard'))
-            
-            total_amount_for_reg = current_reg['total_amount']
-            current_email = current_reg['email']
-            current_name = current_reg['name']
-            
-            paid_amount_to_set = 0.0
-            if new_status == 'paid':
-                paid_amount_to_set = total_amount_for_reg
-
-            conn.execute(
-                'UPDATE registrations SET payment_status = ?, paid_amount = ? WHERE id = ?', 
-                (new_status, paid_amount_to_set, reg_id)
+            # Single UPDATE: paid_amount is derived from total_amount in SQL, no read-before-write
+            cursor = conn.execute(
+                """UPDATE registrations
+                   SET payment_status = ?,
+                       paid_amount = CASE WHEN ? = 'paid' THEN total_amount ELSE 0.0 END
+                   WHERE id = ?""",
+                (new_status, new_status, reg_id)
             )
+            updated = cursor.rowcount > 0
+            if updated:
+                # Paid amount for the change feed; name and e-mail for the confirmation mail
+                current_reg = conn.execute(
+                    'SELECT name, house_number, email, persons_adults, persons_children, total_amount, paid_amount FROM registrations WHERE id = ?',
+                    (reg_id,)
+                ).fetchone()
+                record_change(conn, 'registration_updated', {
+                    'id': reg_id, 'payment_status': new_status, 'paid_amount': current_reg['paid_amount']
+                })
             conn.commit()
 
-            if conn.total_changes > 0:
+            if updated:
                 flash("Status en betaald bedrag succesvol bijgewerkt.", 'success')
                 
-                if new_status == 'paid' and current_email:
-                    bbq_details = get_cached_bbq_details()
-                    subject_paid = "Bevestiging betaling Buurt BBQ verwerkt"
-                    # Get config values for payment confirmation email
-                    bbq_date = get_config_value('bbq_date', bbq_details["date"])
-                    bbq_location = get_config_value('bbq_location', 'het buurthuis')
-                    bbq_contact = get_config_value('bbq_contact_phone', '06-12345678')
-                    
-                    body_paid = f"""
-                    <html>
-                    <body>
-                        <p>Beste {current_name} (Huisnummer {current_reg['house_number']}),</p>
-                        <p>Goed nieuws! Uw betaling van <strong>€{total_amount_for_reg:.2f}</strong> voor de Buurt BBQ is zojuist door de organisatie <strong>verwerkt en bevestigd</strong>.</p>
-                        <p>U bent nu officieel aangemeld voor {current_reg['persons_adults']} volwassene(n) en {current_reg['persons_children']} kind(eren).</p>
-                        <p>Wij kijken ernaar uit u te zien op ons tuinfeest op <strong>{bbq_date}</strong> bij <strong>{bbq_location}</strong>!</p>
-                        <p>Voor vragen kunt u contact opnemen via {bbq_contact}.</p>
-                        <p>Met vriendelijke groet,</p>
-                        <p>Het organisatieteam</p>
-                    </body>
-                    </html>
-                    """
-                    if not send_email(current_email, subject_paid, body_paid):
-                        flash(f'Fout bij versturen van de betalingsbevestiging naar {current_email}.', 'error')
+                if new_status == 'paid' and current_reg['email']:
+                    subject_paid, body_paid = build_payment_confirmation_email(current_reg)
+                    if not send_email(current_reg['email'], subject_paid, body_paid):
+                        flash(f"Fout bij versturen van de betalingsbevestiging naar {current_reg['email']}.", 'error')
 
             else:
-                flash("Aanmelding niet gevonden of status/bedrag was al hetzelfde.", 'info')
+                flash("Aanmelding niet gevonden.", 'info')
         except sqlite3.Error as e:
             conn.rollback()
             flash(f"Fout bij bijwerken status: {e}", 'error')
             logger.error(f"Fout bij bijwerken status: {e}")
 
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('main.admin_dashboard'))
 
-@app.route('/admin/delete_registration/<int:reg_id>', methods=['POST'])
+@bp.route('/admin/delete_registration/<int:reg_id>', methods=['POST'])
 @login_required
 def delete_registration(reg_id):
     with db_pool.get_connection() as conn:
         try:
-            conn.execute('DELETE FROM registrations WHERE id = ?', (reg_id,))
+            cursor = conn.execute('DELETE FROM registrations WHERE id = ?', (reg_id,))
+            if cursor.rowcount > 0:
+                record_change(conn, 'registration_deleted', {'ids': [reg_id]})
             conn.commit()
-            if conn.total_changes > 0:
+            if cursor.rowcount > 0:
                 flash("Aanmelding succesvol verwijderd.", 'success')
             else:
                 flash("Aanmelding niet gevonden.", 'info')
@@ -1161,9 +3718,9 @@ def delete_registration(reg_id):
             flash(f"Fout bij verwijderen aanmelding: {e}", 'error')
             logger.error(f"Fout bij verwijderen aanmelding: {e}")
 
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('main.admin_dashboard'))
 
-@app.route('/admin/bulk_delete_registrations', methods=['POST'])
+@bp.route('/admin/bulk_delete_registrations', methods=['POST'])
 @login_required
 def bulk_delete_registrations():
     """Delete multiple registrations at once"""
@@ -1171,23 +3728,26 @@ def bulk_delete_registrations():
     
     if not registration_ids:
         flash("Geen aanmeldingen geselecteerd voor verwijdering.", 'error')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     
     # Convert to integers and validate
     try:
         reg_ids = [int(reg_id) for reg_id in registration_ids]
     except ValueError:
         flash("Ongeldige aanmelding ID's ontvangen.", 'error')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     
-    deleted_count = 0
+    deleted_ids = []
     with db_pool.get_connection() as conn:
         try:
             # Delete each registration
             for reg_id in reg_ids:
                 cursor = conn.execute('DELETE FROM registrations WHERE id = ?', (reg_id,))
                 if cursor.rowcount > 0:
-                    deleted_count += 1
+                    deleted_ids.append(reg_id)
+            deleted_count = len(deleted_ids)
+            if deleted_ids:
+                record_change(conn, 'registration_deleted', {'ids': deleted_ids})
             
             conn.commit()
             
@@ -1202,18 +3762,113 @@ def bulk_delete_registrations():
             flash(f"Fout bij bulk verwijderen aanmeldingen: {e}", 'error')
             logger.error(f"Fout bij bulk verwijderen aanmeldingen: {e}")
 
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('main.admin_dashboard'))
 
+@bp.route('/admin/reconcile', methods=['GET', 'POST'])
+@login_required
+def reconcile_payments():
+    """Upload a bank statement and review proposed payment matches"""
+    proposals, unmatched, stats = [], [], None
+    if request.method == 'POST':
+        file = request.files.get('statement')
+        if not file or not file.filename:
+            flash('Kies eerst een bankafschrift (CSV of CAMT.053 XML).', 'error')
+            return redirect(url_for('main.reconcile_payments'))
+        started = time.perf_counter()
+        try:
+            with db_pool.get_connection() as conn:
+                pending = conn.execute(
+                    "SELECT id, name, house_number, email, total_amount FROM registrations WHERE payment_status = 'pending'"
+                ).fetchall()
+            proposals, unmatched, stats = match_bank_transactions(parse_bank_statement(file), pending)
+        except (ValueError, ET.ParseError, csv.Error) as e:
+            logger.warning(f"Bankafschrift kon niet worden gelezen: {e}")
+            flash(f'Bankafschrift kon niet worden gelezen: {e}', 'error')
+            return redirect(url_for('main.reconcile_payments'))
+        except sqlite3.Error as e:
+            logger.error(f"Fout bij ophalen openstaande aanmeldingen: {e}")
+            flash(f'Fout bij ophalen openstaande aanmeldingen: {e}', 'error')
+            return redirect(url_for('main.reconcile_payments'))
+        stats['seconds'] = time.perf_counter() - started
+        logger.info(f"Bankafschrift {file.filename}: {stats['credits']} bijschrijvingen, {len(proposals)} voorgestelde koppelingen in {stats['seconds']:.3f}s")
+
+    return render_template('admin_reconcile.html', proposals=proposals, unmatched=unmatched, stats=stats)
+
+@bp.route('/admin/reconcile/apply', methods=['POST'])
+@login_required
+def apply_reconciliation():
+    """Mark the accepted matches as paid in one transaction and queue the confirmation mails"""
+    try:
+        reg_ids = [int(reg_id) for reg_id in request.form.getlist('registration_ids')]
+    except ValueError:
+        flash("Ongeldige aanmelding ID's ontvangen.", 'error')
+        return redirect(url_for('main.reconcile_payments'))
+    if not reg_ids:
+        flash('Geen koppelingen geselecteerd.', 'info')
+        return redirect(url_for('main.reconcile_payments'))
+
+    try:
+        updated = mark_registrations_paid(reg_ids)
+    except sqlite3.Error as e:
+        flash(f"Fout bij verwerken betalingen: {e}", 'error')
+        logger.error(f"Fout bij verwerken betalingen uit bankafschrift: {e}")
+        return redirect(url_for('main.reconcile_payments'))
+
+    send_emails([(reg['email'], *build_payment_confirmation_email(reg)) for reg in updated if reg['email']])
+    logger.info(f"{len(updated)} betaling(en) verwerkt uit bankafschrift: {[reg['id'] for reg in updated]}")
+    flash(f"{len(updated)} aanmelding(en) als betaald gemarkeerd.", 'success')
+    if len(updated) < len(reg_ids):
+        flash(f"{len(reg_ids) - len(updated)} aanmelding(en) stonden niet meer open en zijn overgeslagen.", 'info')
+    return redirect(url_for('main.admin_dashboard'))
+
+@bp.route('/api/webhooks/payment', methods=['POST'])
+@csrf.exempt
+def payment_webhook():
+    """Verify and store a payment provider callback; it is applied in the background"""
+    if not payment_webhook_enabled():
+        return jsonify({'message': 'Betalingsnotificaties zijn niet ingeschakeld.'}), 404
+    request.max_content_length = PAYMENT_WEBHOOK_MAX_CONTENT_LENGTH
+    try:
+        body = request.get_data(cache=False)
+    except RequestEntityTooLarge:
+        return jsonify({'message': 'Notificatie is te groot.'}), 413
+    if not verify_webhook_signature(body, request.headers):
+        logger.warning("Betalingsnotificatie met ongeldige handtekening geweigerd")
+        return jsonify({'message': 'Ongeldige handtekening.'}), 401
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return jsonify({'message': 'Ongeldige JSON.'}), 400
+
+    event_id = payment_event_id(payload, body)
+    with db_pool.get_connection() as conn:
+        try:
+            # Providers retry until they get a 2xx; a repeated event ID is acknowledged but not stored again
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO payment_events (event_id, payload, received_at) VALUES (?, ?, ?)',
+                (event_id, body.decode('utf-8', 'replace'), int(time.time()))
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"Fout bij opslaan betalingsnotificatie {event_id}: {e}")
+            return jsonify({'message': 'Notificatie kon niet worden opgeslagen.'}), 503
+    if cursor.rowcount:
+        payment_processor.notify()
+    else:
+        logger.info(f"Betalingsnotificatie {event_id} was al ontvangen")
+    return jsonify({'received': True, 'duplicate': cursor.rowcount == 0}), 200
 
 # Graceful shutdown handler
-import atexit
 import signal
 
 def cleanup():
     """Cleanup resources on shutdown"""
     logger.info("Shutting down application...")
     db_pool.close_all()
-    email_queue.email_queue.put(None)  # Signal email worker to stop
+    if email_queue.worker_thread is not None:
+        email_queue.email_queue.put(None)  # Signal email worker to stop
+    scheduler.stop()
     logger.info("Cleanup completed.")
 
 atexit.register(cleanup)
@@ -1224,14 +3879,18 @@ def signal_handler(signum, frame):
     cleanup()
     exit(0)
 
-signal.signal(signal.SIGTERM, signal_handler)
-signal.signal(signal.SIGINT, signal_handler)
-
 if __name__ == '__main__':
+    # Only for the development server: under Gunicorn these would replace the
+    # worker's own handlers and cut off in-flight requests on graceful shutdown
+    signal.signal(signal.SIGTERM, signal_handler)
+    signal.signal(signal.SIGINT, signal_handler)
+
     # Only run development server if explicitly requested
     if os.getenv('FLASK_ENV') == 'development':
         logger.info("Starting BBQ application in development mode...")
-        app.run(host='0.0.0.0', debug=True, port=3000, threaded=True)
+        upgrade_database()
+        scheduler.start()
+        create_app().run(host='0.0.0.0', debug=True, port=3000, threaded=True)
     else:
         logger.info("Production mode detected. Use Gunicorn to run the application.")
-        logger.info("Run with: gunicorn --bind 0.0.0.0:3000 --workers 2 app:app")
\ No newline at end of file
+        logger.info("Run with: gunicorn -c gunicorn.conf.py 'app:create_app()'")
\ No newline at end of file
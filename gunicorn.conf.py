@@ -0,0 +1,60 @@
+# Gunicorn configuration for the BBQ App
+#
+# Worker models (select with GUNICORN_WORKER_CLASS):
+#   sync    - one request per worker process; a slow client or password check blocks the worker
+#   gthread - (default) GUNICORN_THREADS request threads per worker; good fit for SQLite + SSE
+#   gevent  - cooperative greenlets, up to GUNICORN_WORKER_CONNECTIONS per worker;
+#             needs `pip install gevent`, falls back to gthread when it is missing
+#
+# The database pool (DB_POOL_SIZE, default 10) is shared by all threads/greenlets of one
+# worker. Keep it >= GUNICORN_THREADS; with gevent, requests beyond the pool size wait up
+# to DB_POOL_TIMEOUT seconds for a free connection.
+#
+# An open live-update stream (/admin/events) holds a request thread under gthread, so there
+# SSE_MAX_STREAMS defaults to 0 and admin dashboards poll the change feed every
+# SSE_POLL_FALLBACK_SECONDS instead. If you raise SSE_MAX_STREAMS, add as many GUNICORN_THREADS,
+# or admin tabs take the threads that serve /api/register and the public pages.
+import os
+import subprocess
+import sys
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:3000')
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 100))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 2))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+if worker_class == 'gevent':
+    try:
+        import gevent  # noqa: F401
+    except ImportError:
+        print("WARNING: gevent is not installed, falling back to the gthread worker class.")
+        worker_class = 'gthread'
+
+if worker_class == 'gthread' and threads > int(os.getenv('DB_POOL_SIZE', 10)):
+    print("WARNING: GUNICORN_THREADS is larger than DB_POOL_SIZE; threads will wait for database connections.")
+
+
+def on_starting(server):
+    """Run schema migrations and default seeding once, before any worker forks.
+
+    Runs `flask db upgrade` in a child process so the master never imports the app;
+    workers then load it fresh (and gevent can patch threading/queue first).
+    """
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'], check=True)
+
+
+def post_worker_init(worker):
+    """Start the background job scheduler (backups) in each worker after the fork.
+
+    All workers run it; a lease row in the database lets only one of them
+    execute each due job.
+    """
+    from app import scheduler
+    scheduler.start()
@@ -0,0 +1,43 @@
+-- Baseline schema; IF NOT EXISTS so databases created before migrations adopt it unchanged
+
+-- Table for registrations with optimized structure
+CREATE TABLE IF NOT EXISTS registrations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    house_number TEXT,
+    email TEXT,
+    persons_adults INTEGER NOT NULL,
+    persons_children INTEGER DEFAULT 0,
+    allergies_notes TEXT,
+    total_amount REAL NOT NULL,
+    bunq_me_url TEXT,
+    payment_status TEXT DEFAULT 'pending',
+    paid_amount REAL DEFAULT 0.0,
+    registered_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Table for users (admin login)
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    email TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    is_active BOOLEAN DEFAULT 1
+);
+
+-- Table for configuration settings
+CREATE TABLE IF NOT EXISTS config (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT UNIQUE NOT NULL,
+    value TEXT,
+    description TEXT,
+    category TEXT DEFAULT 'general',
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create indexes for better query performance
+CREATE INDEX IF NOT EXISTS idx_registrations_payment_status ON registrations(payment_status);
+CREATE INDEX IF NOT EXISTS idx_registrations_registered_at ON registrations(registered_at);
+CREATE INDEX IF NOT EXISTS idx_registrations_email ON registrations(email);
+CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
@@ -0,0 +1,55 @@
+-- Materialized running totals, maintained incrementally by triggers
+CREATE TABLE IF NOT EXISTS registration_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    registration_count INTEGER NOT NULL DEFAULT 0,
+    total_adults INTEGER NOT NULL DEFAULT 0,
+    total_children INTEGER NOT NULL DEFAULT 0,
+    total_due_amount REAL NOT NULL DEFAULT 0.0,
+    total_paid_amount REAL NOT NULL DEFAULT 0.0
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_registration_totals_insert
+AFTER INSERT ON registrations
+BEGIN
+    UPDATE registration_totals SET
+        registration_count = registration_count + 1,
+        total_adults = total_adults + NEW.persons_adults,
+        total_children = total_children + COALESCE(NEW.persons_children, 0),
+        total_due_amount = total_due_amount + NEW.total_amount,
+        total_paid_amount = total_paid_amount + COALESCE(NEW.paid_amount, 0)
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_registration_totals_update
+AFTER UPDATE OF persons_adults, persons_children, total_amount, paid_amount ON registrations
+BEGIN
+    UPDATE registration_totals SET
+        total_adults = total_adults - OLD.persons_adults + NEW.persons_adults,
+        total_children = total_children - COALESCE(OLD.persons_children, 0) + COALESCE(NEW.persons_children, 0),
+        total_due_amount = total_due_amount - OLD.total_amount + NEW.total_amount,
+        total_paid_amount = total_paid_amount - COALESCE(OLD.paid_amount, 0) + COALESCE(NEW.paid_amount, 0)
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_registration_totals_delete
+AFTER DELETE ON registrations
+BEGIN
+    UPDATE registration_totals SET
+        registration_count = registration_count - 1,
+        total_adults = total_adults - OLD.persons_adults,
+        total_children = total_children - COALESCE(OLD.persons_children, 0),
+        total_due_amount = total_due_amount - OLD.total_amount,
+        total_paid_amount = total_paid_amount - COALESCE(OLD.paid_amount, 0)
+    WHERE id = 1;
+END;
+
+-- Fill the summary row from the registrations that already exist
+INSERT OR REPLACE INTO registration_totals
+    (id, registration_count, total_adults, total_children, total_due_amount, total_paid_amount)
+SELECT 1,
+       COUNT(*),
+       COALESCE(SUM(persons_adults), 0),
+       COALESCE(SUM(persons_children), 0),
+       COALESCE(SUM(total_amount), 0.0),
+       COALESCE(SUM(paid_amount), 0.0)
+FROM registrations;
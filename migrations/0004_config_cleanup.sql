@@ -0,0 +1,54 @@
+-- One-time data fixes that used to run on every boot
+
+-- Remove old configuration fields that are no longer used
+DELETE FROM config WHERE key IN ('welcome_text', 'description_text', 'background_image');
+
+-- Move settings created before categories existed out of 'general'
+UPDATE config SET category = 'bbq' WHERE category = 'general' AND key IN (
+    'bbq_date',
+    'bbq_location',
+    'bbq_deadline',
+    'bbq_contact_phone'
+);
+UPDATE config SET category = 'content' WHERE category = 'general' AND key IN (
+    'main_content',
+    'hero_image',
+    'hero_title',
+    'hero_subtitle',
+    'not_planned_mode',
+    'not_planned_text'
+);
+UPDATE config SET category = 'email' WHERE category = 'general' AND key IN (
+    'smtp_server',
+    'smtp_port',
+    'smtp_username',
+    'smtp_password',
+    'organizer_email'
+);
+UPDATE config SET category = 'appearance' WHERE category = 'general' AND key IN (
+    'primary_color',
+    'secondary_color'
+);
+UPDATE config SET category = 'benefits' WHERE category = 'general' AND key IN (
+    'benefit_1_title',
+    'benefit_1_description',
+    'benefit_1_icon',
+    'benefit_2_title',
+    'benefit_2_description',
+    'benefit_2_icon',
+    'benefit_3_title',
+    'benefit_3_description',
+    'benefit_3_icon',
+    'benefit_4_title',
+    'benefit_4_description',
+    'benefit_4_icon'
+);
+UPDATE config SET category = 'variables' WHERE category = 'general' AND key IN (
+    'price_per_adult',
+    'price_per_child'
+);
+UPDATE config SET category = 'payment' WHERE category = 'general' AND key IN (
+    'payment_method',
+    'bunq_me_link',
+    'no_payment_message'
+);
@@ -0,0 +1,13 @@
+-- Token buckets for the rate limiter, shared by all workers
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    bucket TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+
+-- Rejection counters per rate limit rule
+CREATE TABLE IF NOT EXISTS rate_limit_rejections (
+    rule TEXT PRIMARY KEY,
+    rejected INTEGER NOT NULL DEFAULT 0,
+    last_rejected_at DATETIME
+);
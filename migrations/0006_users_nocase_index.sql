@@ -0,0 +1,5 @@
+-- Case-insensitive username lookups can use an index instead of LOWER(username) table scans
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username_nocase ON users(username COLLATE NOCASE);
+
+-- Superseded: the UNIQUE constraint already indexes the exact username
+DROP INDEX IF EXISTS idx_users_username;
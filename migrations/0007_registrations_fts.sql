@@ -0,0 +1,38 @@
+-- Full-text search over registrations for lookups at the entrance
+CREATE VIRTUAL TABLE IF NOT EXISTS registrations_fts USING fts5(
+    name,
+    house_number,
+    email,
+    allergies_notes,
+    content='registrations',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='1 2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_registrations_fts_insert
+AFTER INSERT ON registrations
+BEGIN
+    INSERT INTO registrations_fts (rowid, name, house_number, email, allergies_notes)
+    VALUES (NEW.id, NEW.name, NEW.house_number, NEW.email, NEW.allergies_notes);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_registrations_fts_delete
+AFTER DELETE ON registrations
+BEGIN
+    INSERT INTO registrations_fts (registrations_fts, rowid, name, house_number, email, allergies_notes)
+    VALUES ('delete', OLD.id, OLD.name, OLD.house_number, OLD.email, OLD.allergies_notes);
+END;
+
+-- Status and payment updates do not touch the index
+CREATE TRIGGER IF NOT EXISTS trg_registrations_fts_update
+AFTER UPDATE OF name, house_number, email, allergies_notes ON registrations
+BEGIN
+    INSERT INTO registrations_fts (registrations_fts, rowid, name, house_number, email, allergies_notes)
+    VALUES ('delete', OLD.id, OLD.name, OLD.house_number, OLD.email, OLD.allergies_notes);
+    INSERT INTO registrations_fts (rowid, name, house_number, email, allergies_notes)
+    VALUES (NEW.id, NEW.name, NEW.house_number, NEW.email, NEW.allergies_notes);
+END;
+
+-- Index the registrations that already exist
+INSERT INTO registrations_fts (registrations_fts) VALUES ('rebuild');
@@ -0,0 +1,12 @@
+-- Responses of /api/register keyed by the client's Idempotency-Key header, replayed on retries
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    status_code INTEGER NOT NULL,
+    response_body TEXT NOT NULL,
+    created_at INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys(created_at);
+
+-- Soft duplicate check on (house_number, lower(email))
+CREATE INDEX IF NOT EXISTS idx_registrations_house_email ON registrations(house_number, lower(email));
@@ -0,0 +1,86 @@
+-- Normalized allergy/diet tags per registration for the catering report.
+-- Tags are derived from allergies_notes by substring patterns (Dutch compounds such as
+-- "notenallergie" or "glutenvrij" match too) and kept current by triggers.
+CREATE TABLE IF NOT EXISTS diet_tag_patterns (
+    pattern TEXT PRIMARY KEY,
+    tag TEXT NOT NULL
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO diet_tag_patterns (pattern, tag) VALUES
+    ('gluten', 'glutenvrij'),
+    ('coeliak', 'glutenvrij'),
+    ('tarwe', 'glutenvrij'),
+    ('lactose', 'lactosevrij'),
+    ('zuivel', 'lactosevrij'),
+    ('melkallergie', 'lactosevrij'),
+    ('koemelk', 'lactosevrij'),
+    ('noot', 'noten'),
+    ('noten', 'noten'),
+    ('pinda', 'pinda'),
+    ('vegetari', 'vegetarisch'),
+    ('vegan', 'veganistisch'),
+    ('halal', 'halal'),
+    ('varken', 'geen varkensvlees'),
+    ('geen vis', 'geen vis'),
+    ('visallergie', 'geen vis'),
+    ('schaaldier', 'schaaldieren'),
+    ('garnal', 'schaaldieren'),
+    ('eiallergie', 'ei'),
+    ('ei-allergie', 'ei'),
+    ('eieren', 'ei'),
+    ('soja', 'soja'),
+    ('selderij', 'selderij'),
+    ('mosterd', 'mosterd'),
+    ('sesam', 'sesam'),
+    ('diabet', 'diabetes');
+
+CREATE TABLE IF NOT EXISTS registration_tags (
+    registration_id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (registration_id, tag)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_registration_tags_tag ON registration_tags(tag);
+
+-- Notes that match no pattern are tagged 'overig' so they still get read
+CREATE TRIGGER IF NOT EXISTS trg_registration_tags_insert
+AFTER INSERT ON registrations
+WHEN NEW.allergies_notes IS NOT NULL
+BEGIN
+    INSERT OR IGNORE INTO registration_tags (registration_id, tag)
+    SELECT NEW.id, tag FROM diet_tag_patterns WHERE instr(lower(NEW.allergies_notes), pattern) > 0;
+    INSERT OR IGNORE INTO registration_tags (registration_id, tag)
+    SELECT NEW.id, 'overig'
+    WHERE lower(trim(NEW.allergies_notes)) NOT IN ('', 'geen', 'nee', 'nvt', 'n.v.t.', '-')
+      AND NOT EXISTS (SELECT 1 FROM registration_tags WHERE registration_id = NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_registration_tags_update
+AFTER UPDATE OF allergies_notes ON registrations
+BEGIN
+    DELETE FROM registration_tags WHERE registration_id = OLD.id;
+    INSERT OR IGNORE INTO registration_tags (registration_id, tag)
+    SELECT NEW.id, tag FROM diet_tag_patterns WHERE instr(lower(NEW.allergies_notes), pattern) > 0;
+    INSERT OR IGNORE INTO registration_tags (registration_id, tag)
+    SELECT NEW.id, 'overig'
+    WHERE lower(trim(COALESCE(NEW.allergies_notes, ''))) NOT IN ('', 'geen', 'nee', 'nvt', 'n.v.t.', '-')
+      AND NOT EXISTS (SELECT 1 FROM registration_tags WHERE registration_id = NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_registration_tags_delete
+AFTER DELETE ON registrations
+BEGIN
+    DELETE FROM registration_tags WHERE registration_id = OLD.id;
+END;
+
+-- Tag the registrations that already exist
+INSERT OR IGNORE INTO registration_tags (registration_id, tag)
+SELECT r.id, p.tag
+FROM registrations r
+JOIN diet_tag_patterns p ON instr(lower(r.allergies_notes), p.pattern) > 0;
+
+INSERT OR IGNORE INTO registration_tags (registration_id, tag)
+SELECT r.id, 'overig'
+FROM registrations r
+WHERE lower(trim(COALESCE(r.allergies_notes, ''))) NOT IN ('', 'geen', 'nee', 'nvt', 'n.v.t.', '-')
+  AND NOT EXISTS (SELECT 1 FROM registration_tags t WHERE t.registration_id = r.id);
@@ -0,0 +1,12 @@
+-- Background job bookkeeping: the lease makes sure only one Gunicorn worker runs a job at a time
+CREATE TABLE IF NOT EXISTS scheduled_jobs (
+    name TEXT PRIMARY KEY,
+    lease_owner TEXT,
+    lease_expires_at REAL NOT NULL DEFAULT 0,
+    last_started_at REAL,
+    last_finished_at REAL,
+    last_duration REAL,
+    last_status TEXT,
+    last_detail TEXT,
+    run_count INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
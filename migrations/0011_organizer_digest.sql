@@ -0,0 +1,11 @@
+-- Organizer digest cursor: registrations with an id above last_registration_id have not been reported yet
+CREATE TABLE IF NOT EXISTS organizer_digest (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_registration_id INTEGER NOT NULL DEFAULT 0,
+    last_sent_at DATETIME,
+    digests_sent INTEGER NOT NULL DEFAULT 0
+);
+
+-- Existing registrations were already reported one by one
+INSERT OR IGNORE INTO organizer_digest (id, last_registration_id)
+SELECT 1, COALESCE(MAX(id), 0) FROM registrations;
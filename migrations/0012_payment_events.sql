@@ -0,0 +1,13 @@
+-- Inbox of payment provider callbacks: stored as received, applied later by the payment event processor
+CREATE TABLE IF NOT EXISTS payment_events (
+    id INTEGER PRIMARY KEY,
+    event_id TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    received_at INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',  -- pending, applied, unmatched or ignored
+    registration_id INTEGER,
+    processed_at INTEGER
+);
+
+-- The processor only looks for pending events, oldest first
+CREATE INDEX IF NOT EXISTS idx_payment_events_pending ON payment_events(id) WHERE status = 'pending';
@@ -0,0 +1,74 @@
+-- Nut tags matched bare 'noot'/'noten' anywhere, so "huisgenoten" or "genoten" counted as a
+-- nut allergy. Patterns with surrounding spaces now match whole words only: notes are lowercased,
+-- punctuation becomes spaces and the text is padded with a space on both sides.
+DELETE FROM diet_tag_patterns WHERE pattern IN ('noot', 'noten');
+
+INSERT OR IGNORE INTO diet_tag_patterns (pattern, tag) VALUES
+    (' noot ', 'noten'),
+    (' noten ', 'noten'),
+    (' nootjes ', 'noten'),
+    ('notenallergie', 'noten'),
+    ('noten-allergie', 'noten'),
+    ('nootallergie', 'noten'),
+    ('notenvrij', 'noten'),
+    ('walnoot', 'noten'),
+    ('walnoten', 'noten'),
+    ('hazelnoot', 'noten'),
+    ('hazelnoten', 'noten'),
+    ('paranoot', 'noten'),
+    ('paranoten', 'noten'),
+    ('cashew', 'noten'),
+    ('amandel', 'noten'),
+    ('pecan', 'noten'),
+    ('pistache', 'noten'),
+    ('macadamia', 'noten');
+
+DROP TRIGGER IF EXISTS trg_registration_tags_insert;
+DROP TRIGGER IF EXISTS trg_registration_tags_update;
+
+CREATE TRIGGER trg_registration_tags_insert
+AFTER INSERT ON registrations
+WHEN NEW.allergies_notes IS NOT NULL
+BEGIN
+    INSERT OR IGNORE INTO registration_tags (registration_id, tag)
+    SELECT NEW.id, tag FROM diet_tag_patterns
+    WHERE instr(' ' || replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(
+              lower(NEW.allergies_notes), ',', ' '), '.', ' '), ';', ' '), ':', ' '), '!', ' '), '?', ' '),
+              '(', ' '), ')', ' '), '/', ' '), char(10), ' '), char(13), ' ') || ' ', pattern) > 0;
+    INSERT OR IGNORE INTO registration_tags (registration_id, tag)
+    SELECT NEW.id, 'overig'
+    WHERE lower(trim(NEW.allergies_notes)) NOT IN ('', 'geen', 'nee', 'nvt', 'n.v.t.', '-')
+      AND NOT EXISTS (SELECT 1 FROM registration_tags WHERE registration_id = NEW.id);
+END;
+
+CREATE TRIGGER trg_registration_tags_update
+AFTER UPDATE OF allergies_notes ON registrations
+BEGIN
+    DELETE FROM registration_tags WHERE registration_id = OLD.id;
+    INSERT OR IGNORE INTO registration_tags (registration_id, tag)
+    SELECT NEW.id, tag FROM diet_tag_patterns
+    WHERE instr(' ' || replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(
+              lower(NEW.allergies_notes), ',', ' '), '.', ' '), ';', ' '), ':', ' '), '!', ' '), '?', ' '),
+              '(', ' '), ')', ' '), '/', ' '), char(10), ' '), char(13), ' ') || ' ', pattern) > 0;
+    INSERT OR IGNORE INTO registration_tags (registration_id, tag)
+    SELECT NEW.id, 'overig'
+    WHERE lower(trim(COALESCE(NEW.allergies_notes, ''))) NOT IN ('', 'geen', 'nee', 'nvt', 'n.v.t.', '-')
+      AND NOT EXISTS (SELECT 1 FROM registration_tags t WHERE t.registration_id = NEW.id);
+END;
+
+-- Re-tag the registrations that already exist
+DELETE FROM registration_tags;
+
+INSERT OR IGNORE INTO registration_tags (registration_id, tag)
+SELECT r.id, p.tag
+FROM registrations r
+JOIN diet_tag_patterns p
+  ON instr(' ' || replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(
+         lower(r.allergies_notes), ',', ' '), '.', ' '), ';', ' '), ':', ' '), '!', ' '), '?', ' '),
+         '(', ' '), ')', ' '), '/', ' '), char(10), ' '), char(13), ' ') || ' ', p.pattern) > 0;
+
+INSERT OR IGNORE INTO registration_tags (registration_id, tag)
+SELECT r.id, 'overig'
+FROM registrations r
+WHERE lower(trim(COALESCE(r.allergies_notes, ''))) NOT IN ('', 'geen', 'nee', 'nvt', 'n.v.t.', '-')
+  AND NOT EXISTS (SELECT 1 FROM registration_tags t WHERE t.registration_id = r.id);
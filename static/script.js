@@ -11,8 +11,100 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Initialize animations
     initializeAnimations();
+
+    // Live availability figures
+    initializeAvailability();
+
+    // Service worker: cached page shell and offline registration queue
+    initializeOfflineSupport();
 });
 
+function initializeOfflineSupport() {
+    if (!('serviceWorker' in navigator)) return;
+
+    navigator.serviceWorker.register('/sw.js')
+        .catch(error => console.warn('Service worker niet geregistreerd:', error));
+
+    // A registration queued while offline has been delivered by the service worker
+    navigator.serviceWorker.addEventListener('message', event => {
+        if (event.data && event.data.type === 'registration-synced') {
+            handleSyncedRegistration(event.data);
+        }
+    });
+
+    // Without Background Sync the page triggers the replay itself
+    if (!('SyncManager' in window)) {
+        const replay = () => navigator.serviceWorker.ready
+            .then(registration => registration.active && registration.active.postMessage({ type: 'replay-registrations' }));
+        window.addEventListener('online', replay);
+        replay();
+    }
+}
+
+function handleSyncedRegistration(message) {
+    if (message.status >= 200 && message.status < 300) {
+        pendingSubmission = null;
+        handleRegistrationSuccess(message.data);
+    } else if (message.status === 409) {
+        showMessage(`${message.data.message} Verstuur het formulier opnieuw als u zich toch nogmaals wilt aanmelden.`, 'error');
+    } else {
+        showMessage(message.data.message || 'Uw bewaarde aanmelding kon niet worden verwerkt. Probeer het opnieuw.', 'error');
+    }
+}
+
+// Availability polling; the server answers 304 while the figures are unchanged
+const AVAILABILITY_POLL_INTERVAL = 15000;
+let availabilityEtag = null;
+let availabilityTimer = null;
+
+function initializeAvailability() {
+    const element = document.getElementById('availability');
+    if (!element) return;
+
+    loadAvailability(element);
+    document.addEventListener('visibilitychange', () => {
+        // Hidden tabs stop polling and catch up when they become visible again
+        clearTimeout(availabilityTimer);
+        if (document.visibilityState === 'visible') {
+            loadAvailability(element);
+        }
+    });
+}
+
+function loadAvailability(element) {
+    const headers = availabilityEtag ? { 'If-None-Match': availabilityEtag } : {};
+    fetch('/api/availability', { headers: headers, cache: 'no-store' })
+        .then(response => {
+            if (response.status === 304) return null;
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            availabilityEtag = response.headers.get('ETag');
+            return response.json();
+        })
+        .then(data => {
+            if (data) renderAvailability(element, data);
+        })
+        .catch(error => console.warn('Beschikbaarheid niet geladen:', error))
+        .finally(() => {
+            clearTimeout(availabilityTimer);
+            if (document.visibilityState === 'visible') {
+                availabilityTimer = setTimeout(() => loadAvailability(element), AVAILABILITY_POLL_INTERVAL);
+            }
+        });
+}
+
+function renderAvailability(element, data) {
+    const households = `${data.households} ${data.households === 1 ? 'huishouden' : 'huishoudens'} aangemeld`;
+    let text = households;
+    if (data.capacity !== null) {
+        text = data.spots_left > 0
+            ? `Nog ${data.spots_left} ${data.spots_left === 1 ? 'plaats' : 'plaatsen'} vrij · ${households}`
+            : `Vol: alle plaatsen zijn bezet · ${households}`;
+    }
+    element.textContent = text;
+    element.classList.toggle('full', data.capacity !== null && data.spots_left === 0);
+    element.hidden = false;
+}
+
 // Form handling
 function initializeForm() {
     const form = document.getElementById('bbqForm');
@@ -64,52 +156,98 @@ function handleFormSubmit(e) {
     showMessage('Uw aanmelding wordt verwerkt...', 'info');
     
     // Submit form
-    fetch('/api/register', {
-        method: 'POST',
-        body: JSON.stringify(jsonData),
-        headers: {
-            'Content-Type': 'application/json',
-            'X-Requested-With': 'XMLHttpRequest'
+    submitRegistration(jsonData)
+    .then(data => {
+        if (!data) {
+            // Duplicate warning declined, nothing was saved
+            showMessage('Aanmelding niet verstuurd.', 'info');
+            return;
         }
-    })
-    .then(response => {
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+        if (data.queued) {
+            // Offline: the service worker sends it once the connection is back
+            showMessage(data.message, 'info');
+            return;
         }
-        return response.json();
+        pendingSubmission = null;
+        handleRegistrationSuccess(data);
     })
-    .then(data => {
-        if (data.paymentMethod === 'bunq' && data.paymentUrl) {
+    .catch(error => {
+        console.error('Form submission error:', error);
+        showMessage('Er is een fout opgetreden. Controleer uw internetverbinding en probeer het opnieuw.', 'error');
+    })
+    .finally(() => {
+        resetButtonState(submitButton, buttonText, buttonLoading);
+    });
+}
+
+function handleRegistrationSuccess(data) {
+    if (data.paymentMethod === 'bunq' && data.paymentUrl) {
+        showMessage('Aanmelding succesvol! U wordt doorgestuurd naar de betaalpagina...', 'success');
+        setTimeout(() => {
+            window.location.href = data.paymentUrl;
+        }, 2000);
+    } else if (data.paymentMethod === 'none') {
+        showMessage(data.message || 'Aanmelding succesvol!', 'success');
+        setTimeout(() => {
+            window.location.href = '/success';
+        }, 2000);
+    } else {
+        // Fallback for backward compatibility
+        if (data.paymentUrl) {
             showMessage('Aanmelding succesvol! U wordt doorgestuurd naar de betaalpagina...', 'success');
             setTimeout(() => {
                 window.location.href = data.paymentUrl;
             }, 2000);
-        } else if (data.paymentMethod === 'none') {
+        } else {
             showMessage(data.message || 'Aanmelding succesvol!', 'success');
             setTimeout(() => {
                 window.location.href = '/success';
             }, 2000);
-        } else {
-            // Fallback for backward compatibility
-            if (data.paymentUrl) {
-                showMessage('Aanmelding succesvol! U wordt doorgestuurd naar de betaalpagina...', 'success');
-                setTimeout(() => {
-                    window.location.href = data.paymentUrl;
-                }, 2000);
-            } else {
-                showMessage(data.message || 'Aanmelding succesvol!', 'success');
-                setTimeout(() => {
-                    window.location.href = '/success';
-                }, 2000);
-            }
+        }
+    }
+}
+
+// Idempotency key of the submission in progress; a retry of the same data reuses it,
+// so the server replays the first response instead of registering twice
+let pendingSubmission = null;
+
+function generateIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    const bytes = new Uint8Array(16);
+    crypto.getRandomValues(bytes);
+    return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+}
+
+function submitRegistration(jsonData) {
+    const body = JSON.stringify(jsonData);
+    if (!pendingSubmission || pendingSubmission.body !== body) {
+        pendingSubmission = { body: body, key: generateIdempotencyKey() };
+    }
+
+    return fetch('/api/register', {
+        method: 'POST',
+        body: body,
+        headers: {
+            'Content-Type': 'application/json',
+            'X-Requested-With': 'XMLHttpRequest',
+            'Idempotency-Key': pendingSubmission.key
         }
     })
-    .catch(error => {
-        console.error('Form submission error:', error);
-        showMessage('Er is een fout opgetreden. Controleer uw internetverbinding en probeer het opnieuw.', 'error');
-    })
-    .finally(() => {
-        resetButtonState(submitButton, buttonText, buttonLoading);
+    .then(response => {
+        if (response.status === 409) {
+            return response.json().then(data => {
+                if (!data.duplicate || !confirm(`${data.message} Wilt u zich toch nogmaals aanmelden?`)) {
+                    return null;
+                }
+                return submitRegistration(Object.assign({}, jsonData, { confirmDuplicate: true }));
+            });
+        }
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        return response.json();
     });
 }
 
@@ -0,0 +1,182 @@
+// BBQ App service worker: precached page shell, cache-first static files and
+// registrations queued while offline, replayed with Background Sync
+const CACHE_PREFIX = 'bbq-';
+const CACHE_NAME = CACHE_PREFIX + '{{ version }}';
+const PRECACHE_URLS = {{ precache|tojson }};
+const OPTIONAL_PRECACHE_URLS = {{ optional_precache|tojson }};  // a failure here does not abort the install
+const PAGE_PATHS = PRECACHE_URLS.filter(url => !url.startsWith('/static/'));
+const NAVIGATION_TIMEOUT = 3000;  // ms before a slow network falls back to the cached page
+
+const QUEUE_DB = 'bbq-offline';
+const QUEUE_STORE = 'registrations';
+const SYNC_TAG = 'bbq-register';
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE_NAME)
+            .then(cache => Promise.all([
+                cache.addAll(PRECACHE_URLS),
+                ...OPTIONAL_PRECACHE_URLS.map(url => cache.add(url).catch(() => undefined))
+            ]))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(
+                keys.filter(key => key.startsWith(CACHE_PREFIX) && key !== CACHE_NAME)
+                    .map(key => caches.delete(key))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    if (request.method === 'POST' && url.pathname === '/api/register') {
+        event.respondWith(registerOrQueue(request));
+    } else if (request.method !== 'GET') {
+        return;
+    } else if (request.mode === 'navigate' && PAGE_PATHS.includes(url.pathname)) {
+        event.respondWith(networkFirst(request, url.pathname));
+    } else if (url.pathname.startsWith('/static/')) {
+        event.respondWith(cacheFirst(request));
+    }
+});
+
+// Pages: the network answers with a 304 when nothing changed; a slow or missing
+// network falls back to the cached copy
+function networkFirst(request, path) {
+    const network = fetch(request).then(response => {
+        if (response.ok) {
+            const copy = response.clone();
+            caches.open(CACHE_NAME).then(cache => cache.put(path, copy));
+        }
+        return response;
+    });
+    const timeout = new Promise(resolve => setTimeout(resolve, NAVIGATION_TIMEOUT))
+        .then(() => caches.match(path));
+    return Promise.race([network, timeout])
+        .then(response => response || network)
+        .catch(() => caches.match(path).then(response => response || Response.error()));
+}
+
+// Static files have a content hash in their URL, so a cached copy never goes stale
+function cacheFirst(request) {
+    return caches.match(request).then(cached => {
+        if (cached) return cached;
+        return fetch(request).then(response => {
+            if (response.ok) {
+                const copy = response.clone();
+                caches.open(CACHE_NAME).then(cache => cache.put(request, copy));
+            }
+            return response;
+        });
+    });
+}
+
+// Registrations: when the POST cannot reach the server it is stored and replayed
+// later with the same Idempotency-Key, so a replay never registers twice
+function registerOrQueue(request) {
+    const copy = request.clone();
+    return fetch(request).catch(error => {
+        const key = copy.headers.get('Idempotency-Key');
+        if (!key) throw error;
+        return copy.text()
+            .then(body => queuePut({ key: key, body: body, queuedAt: Date.now() }))
+            .then(requestSync)
+            .then(() => new Response(JSON.stringify({
+                queued: true,
+                message: 'U bent offline. Uw aanmelding is bewaard en wordt automatisch verstuurd zodra er weer verbinding is.'
+            }), { status: 202, headers: { 'Content-Type': 'application/json' } }));
+    });
+}
+
+function requestSync() {
+    if (self.registration.sync) {
+        return self.registration.sync.register(SYNC_TAG).catch(() => undefined);
+    }
+    return undefined;
+}
+
+self.addEventListener('sync', event => {
+    if (event.tag === SYNC_TAG) {
+        event.waitUntil(replayQueue());
+    }
+});
+
+// Browsers without Background Sync: the page asks for a replay when it is back online
+self.addEventListener('message', event => {
+    if (event.data && event.data.type === 'replay-registrations') {
+        event.waitUntil(replayQueue().catch(() => undefined));
+    }
+});
+
+async function replayQueue() {
+    const entries = await queueGetAll();
+    for (const entry of entries) {
+        // A network error rejects, so Background Sync tries again later
+        const response = await fetch('/api/register', {
+            method: 'POST',
+            body: entry.body,
+            headers: {
+                'Content-Type': 'application/json',
+                'X-Requested-With': 'XMLHttpRequest',
+                'Idempotency-Key': entry.key
+            }
+        });
+        if (response.status >= 500 || response.status === 429) {
+            throw new Error(`Aanmelding nog niet verwerkt (HTTP ${response.status})`);
+        }
+        const data = await response.json().catch(() => ({}));
+        await queueDelete(entry.key);
+        await notifyClients({ type: 'registration-synced', status: response.status, data: data });
+    }
+}
+
+function notifyClients(message) {
+    return self.clients.matchAll({ type: 'window', includeUncontrolled: true })
+        .then(clients => clients.forEach(client => client.postMessage(message)));
+}
+
+// Minimal IndexedDB helpers for the queue (one object store keyed by Idempotency-Key)
+function openQueue() {
+    return new Promise((resolve, reject) => {
+        const open = indexedDB.open(QUEUE_DB, 1);
+        open.onupgradeneeded = () => open.result.createObjectStore(QUEUE_STORE, { keyPath: 'key' });
+        open.onsuccess = () => resolve(open.result);
+        open.onerror = () => reject(open.error);
+    });
+}
+
+function queueTransaction(mode, action) {
+    return openQueue().then(db => new Promise((resolve, reject) => {
+        const transaction = db.transaction(QUEUE_STORE, mode);
+        const result = action(transaction.objectStore(QUEUE_STORE));
+        transaction.oncomplete = () => {
+            db.close();
+            resolve(result.result);
+        };
+        transaction.onerror = () => {
+            db.close();
+            reject(transaction.error);
+        };
+    }));
+}
+
+function queuePut(entry) {
+    return queueTransaction('readwrite', store => store.put(entry));
+}
+
+function queueGetAll() {
+    return queueTransaction('readonly', store => store.getAll());
+}
+
+function queueDelete(key) {
+    return queueTransaction('readwrite', store => store.delete(key));
+}